@@ -0,0 +1,42 @@
+"""add orders created at and pagination indexes
+
+Revision ID: 5b8e0d4a6c13
+Revises: 3f1c9a2d7e45
+Create Date: 2026-10-17 11:03:27.540912
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5b8e0d4a6c13"
+down_revision: Union[str, None] = "3f1c9a2d7e45"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "orders",
+        sa.Column(
+            "created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()
+        ),
+    )
+    op.create_index("ix_orders_user_id_id", "orders", ["user_id", "id"])
+    op.create_index(
+        "ix_orders_user_id_created_at", "orders", ["user_id", "created_at", "id"]
+    )
+    op.create_index("ix_products_price_id", "products", ["price", "id"])
+    op.create_index("ix_reservations_time_id", "reservations", ["time", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reservations_time_id", "reservations")
+    op.drop_index("ix_products_price_id", "products")
+    op.drop_index("ix_orders_user_id_created_at", "orders")
+    op.drop_index("ix_orders_user_id_id", "orders")
+    op.drop_column("orders", "created_at")
@@ -0,0 +1,44 @@
+"""create sales rollup tables
+
+Revision ID: 7d3f8a61b2c4
+Revises: e4b19d7a3c52
+Create Date: 2026-10-17 19:41:08.662190
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7d3f8a61b2c4"
+down_revision: Union[str, None] = "e4b19d7a3c52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Fill the tables with `python -m analytics.backfill` afterwards.
+    op.create_table(
+        "daily_sales",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("day", "status"),
+    )
+    op.create_table(
+        "daily_product_sales",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("day", "product_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("daily_product_sales")
+    op.drop_table("daily_sales")
@@ -0,0 +1,40 @@
+"""convert carts products to jsonb
+
+Revision ID: 9a4d2c7f1e08
+Revises: 5b8e0d4a6c13
+Create Date: 2026-10-17 13:47:05.226391
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9a4d2c7f1e08"
+down_revision: Union[str, None] = "5b8e0d4a6c13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        "carts",
+        "products",
+        type_=JSONB(),
+        postgresql_using="products::jsonb",
+        server_default=sa.text("'{}'::jsonb"),
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        "carts",
+        "products",
+        type_=sa.JSON(),
+        postgresql_using="products::json",
+        server_default=None,
+    )
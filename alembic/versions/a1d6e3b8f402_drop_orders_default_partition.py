@@ -0,0 +1,67 @@
+"""drop orders default partition
+
+Revision ID: a1d6e3b8f402
+Revises: f3a7c2d9e815
+Create Date: 2026-10-18 16:52:03.418276
+
+"""
+
+from typing import Sequence, Union
+
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a1d6e3b8f402"
+down_revision: Union[str, None] = "f3a7c2d9e815"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "id, user_id, products, total_price, status, created_at"
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    # Partitions can't be detached concurrently while a default partition
+    # exists, so the orders in it are moved to monthly partitions first.
+    months = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT DISTINCT CAST(date_trunc('month', created_at) AS date) "
+                "FROM orders_default ORDER BY 1"
+            )
+        )
+        .scalars()
+        .all()
+    )
+    for month in months:
+        name = f"orders_{month:%Y_%m}"
+        op.execute(f"CREATE TABLE {name} (LIKE orders INCLUDING DEFAULTS)")
+        op.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM orders_default
+                WHERE created_at >= '{month}' AND created_at < '{_next_month(month)}'
+                RETURNING {COLUMNS}
+            )
+            INSERT INTO {name} ({COLUMNS}) SELECT {COLUMNS} FROM moved
+            """
+        )
+        op.execute(
+            f"ALTER TABLE orders ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{month}') TO ('{_next_month(month)}')"
+        )
+
+    op.execute("ALTER TABLE orders DETACH PARTITION orders_default")
+    op.drop_table("orders_default")
+
+
+def downgrade() -> None:
+    op.execute("CREATE TABLE orders_default PARTITION OF orders DEFAULT")
@@ -0,0 +1,100 @@
+"""convert orders products to jsonb
+
+Revision ID: a8c5e3f29d17
+Revises: 7d3f8a61b2c4
+Create Date: 2026-10-17 21:12:45.104377
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a8c5e3f29d17"
+down_revision: Union[str, None] = "7d3f8a61b2c4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHUNK_SIZE = 10000
+
+
+def upgrade() -> None:
+    # Rewriting the column in place would lock the table for the whole
+    # rewrite. Instead the JSONB copy is added next to it, kept in sync by a
+    # trigger, filled in chunks and swapped in at the end.
+    op.add_column("orders", sa.Column("products_jsonb", JSONB(), nullable=True))
+    op.execute(
+        """
+        CREATE FUNCTION orders_products_jsonb_sync() RETURNS trigger AS $$
+        BEGIN
+            NEW.products_jsonb := CAST(NEW.products AS jsonb);
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER orders_products_jsonb_sync
+        BEFORE INSERT OR UPDATE OF products ON orders
+        FOR EACH ROW EXECUTE FUNCTION orders_products_jsonb_sync()
+        """
+    )
+
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        max_id = conn.execute(sa.text("SELECT max(id) FROM orders")).scalar() or 0
+        for lo in range(0, max_id, CHUNK_SIZE):
+            conn.execute(
+                sa.text(
+                    """
+                    UPDATE orders SET products_jsonb = CAST(products AS jsonb)
+                    WHERE id > :lo AND id <= :hi AND products_jsonb IS NULL
+                    """
+                ),
+                {"lo": lo, "hi": lo + CHUNK_SIZE},
+            )
+
+        # A validated CHECK lets SET NOT NULL skip its full table scan, and
+        # validating it doesn't block writes.
+        op.execute(
+            "ALTER TABLE orders ADD CONSTRAINT ck_orders_products_jsonb_not_null "
+            "CHECK (products_jsonb IS NOT NULL) NOT VALID"
+        )
+        op.execute(
+            "ALTER TABLE orders VALIDATE CONSTRAINT ck_orders_products_jsonb_not_null"
+        )
+        op.create_index(
+            "ix_orders_products",
+            "orders",
+            ["products_jsonb"],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+        )
+
+    op.alter_column("orders", "products_jsonb", nullable=False)
+    op.drop_constraint("ck_orders_products_jsonb_not_null", "orders")
+    op.execute("DROP TRIGGER orders_products_jsonb_sync ON orders")
+    op.execute("DROP FUNCTION orders_products_jsonb_sync()")
+    op.drop_column("orders", "products")
+    op.alter_column(
+        "orders",
+        "products_jsonb",
+        new_column_name="products",
+        server_default=sa.text("'{}'::jsonb"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_products", "orders")
+    op.alter_column(
+        "orders",
+        "products",
+        type_=sa.JSON(),
+        postgresql_using="products::json",
+        server_default=None,
+    )
@@ -0,0 +1,71 @@
+"""add tables to reservations
+
+Revision ID: b7e2d94c1f58
+Revises: d5f1b8c27e94
+Create Date: 2026-10-18 01:12:37.845203
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from sqlmodel.sql.sqltypes import AutoString
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e2d94c1f58"
+down_revision: Union[str, None] = "d5f1b8c27e94"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The default RESERVATION_DURATION_MINUTES, given to existing reservations.
+DURATION_MINUTES = 120
+
+
+def upgrade() -> None:
+    op.create_table(
+        "dining_tables",
+        sa.Column("id", sa.Integer()),
+        sa.Column("name", AutoString(), nullable=False),
+        sa.Column("seats", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+
+    op.add_column("reservations", sa.Column("end_time", sa.DateTime()))
+    op.add_column(
+        "reservations",
+        sa.Column("table_id", sa.Integer(), sa.ForeignKey("dining_tables.id")),
+    )
+    op.add_column(
+        "reservations",
+        sa.Column("guests", sa.Integer(), nullable=False, server_default="1"),
+    )
+    op.execute(
+        "UPDATE reservations "
+        f"SET end_time = time + interval '{DURATION_MINUTES} minutes'"
+    )
+    op.alter_column("reservations", "end_time", nullable=False)
+
+    # A single-value range stands in for the table id, so the constraint
+    # can use the built-in GiST range operator class without btree_gist.
+    # Existing reservations have no table and are not constrained.
+    op.execute(
+        """
+        ALTER TABLE reservations ADD CONSTRAINT ex_reservations_table_id_time
+        EXCLUDE USING gist (
+            int4range(table_id, table_id, '[]') WITH =,
+            tsrange(time, end_time) WITH &&
+        ) WHERE (table_id IS NOT NULL)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("ex_reservations_table_id_time", "reservations")
+    op.drop_column("reservations", "guests")
+    op.drop_column("reservations", "table_id")
+    op.drop_column("reservations", "end_time")
+    op.drop_table("dining_tables")
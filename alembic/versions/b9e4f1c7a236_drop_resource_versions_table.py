@@ -0,0 +1,41 @@
+"""drop resource versions table
+
+Revision ID: b9e4f1c7a236
+Revises: a1d6e3b8f402
+Create Date: 2026-10-19 10:15:42.906318
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from sqlmodel.sql.sqltypes import AutoString
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b9e4f1c7a236"
+down_revision: Union[str, None] = "a1d6e3b8f402"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ETags are derived from the response bodies in each worker.
+    op.drop_table("resource_versions")
+
+
+def downgrade() -> None:
+    op.create_table(
+        "resource_versions",
+        sa.Column("key", AutoString()),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.PrimaryKeyConstraint("key"),
+    )
@@ -0,0 +1,88 @@
+"""create cart items table
+
+Revision ID: c2e7f50b8a91
+Revises: 9a4d2c7f1e08
+Create Date: 2026-10-17 15:20:51.904117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c2e7f50b8a91"
+down_revision: Union[str, None] = "9a4d2c7f1e08"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "cart_items",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("unit_price", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "product_id"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"], ondelete="CASCADE"),
+    )
+    op.create_index("ix_cart_items_product_id", "cart_items", ["product_id"])
+
+    # Items of products that no longer exist are dropped.
+    op.execute(
+        """
+        INSERT INTO cart_items (user_id, product_id, quantity, unit_price)
+        SELECT
+            c.user_id,
+            p.id,
+            CAST(item.value ->> 'quantity' AS integer),
+            CAST(item.value ->> 'price' AS float)
+            / CAST(item.value ->> 'quantity' AS integer)
+        FROM carts c
+        CROSS JOIN LATERAL jsonb_each(c.products) AS item
+        JOIN products p ON p.id = CAST(item.key AS integer)
+        WHERE CAST(item.value ->> 'quantity' AS integer) > 0
+        """
+    )
+
+    op.drop_table("carts")
+
+
+def downgrade() -> None:
+    op.create_table(
+        "carts",
+        sa.Column("user_id", sa.Integer()),
+        sa.Column(
+            "products",
+            JSONB(),
+            nullable=False,
+            server_default=sa.text("'{}'::jsonb"),
+        ),
+        sa.Column("total_price", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+    )
+
+    op.execute(
+        """
+        INSERT INTO carts (user_id, products, total_price)
+        SELECT
+            user_id,
+            jsonb_object_agg(
+                CAST(product_id AS text),
+                jsonb_build_object(
+                    'quantity', quantity, 'price', unit_price * quantity
+                )
+            ),
+            sum(unit_price * quantity)
+        FROM cart_items
+        GROUP BY user_id
+        """
+    )
+
+    op.drop_table("cart_items")
@@ -0,0 +1,45 @@
+"""create resource versions table
+
+Revision ID: c4a9e1f7d2b3
+Revises: b7e2d94c1f58
+Create Date: 2026-10-18 09:24:51.602318
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from sqlmodel.sql.sqltypes import AutoString
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4a9e1f7d2b3"
+down_revision: Union[str, None] = "b7e2d94c1f58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    table = op.create_table(
+        "resource_versions",
+        sa.Column("key", AutoString()),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    # Validators handed out before the upgrade must not match.
+    op.bulk_insert(
+        table,
+        [{"key": "categories", "version": 1}, {"key": "products", "version": 1}],
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("resource_versions")
@@ -0,0 +1,125 @@
+"""partition orders by month
+
+Revision ID: d5f1b8c27e94
+Revises: a8c5e3f29d17
+Create Date: 2026-10-17 23:40:12.318904
+
+"""
+
+from typing import Sequence, Union
+
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+from sqlmodel.sql.sqltypes import AutoString
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d5f1b8c27e94"
+down_revision: Union[str, None] = "a8c5e3f29d17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions are created up to this many months after the current one;
+# later ones are created by `python -m orders.maintenance`.
+MONTHS_AHEAD = 3
+
+COLUMNS = "id, user_id, products, total_price, status, created_at"
+
+TABLE = """
+    CREATE TABLE {name} (
+        id integer NOT NULL DEFAULT nextval('orders_id_seq'),
+        user_id integer NOT NULL,
+        products jsonb NOT NULL DEFAULT '{{}}'::jsonb,
+        total_price double precision NOT NULL,
+        status varchar NOT NULL,
+        created_at timestamp without time zone NOT NULL DEFAULT now()
+    ) {options}
+"""
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _swap(new: str, copy_from: Sequence[str]):
+    # The sequence would be dropped with the table that owns it.
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY NONE")
+    for table in copy_from:
+        op.execute(f"INSERT INTO {new} ({COLUMNS}) SELECT {COLUMNS} FROM {table}")
+    op.drop_table("orders")
+    op.rename_table(new, "orders")
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY orders.id")
+
+
+def _create_constraints_and_indexes(primary_key: Sequence[str]):
+    op.create_primary_key("orders_pkey", "orders", primary_key)
+    op.create_foreign_key(
+        "orders_user_id_fkey",
+        "orders",
+        "users",
+        ["user_id"],
+        ["id"],
+        ondelete="CASCADE",
+    )
+    op.create_index("ix_orders_user_id_id", "orders", ["user_id", "id"])
+    op.create_index(
+        "ix_orders_user_id_created_at", "orders", ["user_id", "created_at", "id"]
+    )
+    op.create_index(
+        "ix_orders_products", "orders", ["products"], postgresql_using="gin"
+    )
+
+
+def upgrade() -> None:
+    # Writes to orders wait while the rows are copied; reads go on.
+    op.execute("LOCK TABLE orders IN SHARE MODE")
+
+    op.execute(
+        TABLE.format(
+            name="orders_partitioned", options="PARTITION BY RANGE (created_at)"
+        )
+    )
+    oldest = (
+        op.get_bind().execute(sa.text("SELECT min(created_at) FROM orders")).scalar()
+    )
+    month = (oldest.date() if oldest is not None else date.today()).replace(day=1)
+    last = date.today().replace(day=1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE orders_{month:%Y_%m} PARTITION OF orders_partitioned "
+            f"FOR VALUES FROM ('{month}') TO ('{_next_month(month)}')"
+        )
+        month = _next_month(month)
+    # Catches orders of months whose partition hasn't been created yet.
+    op.execute("CREATE TABLE orders_default PARTITION OF orders_partitioned DEFAULT")
+
+    _swap("orders_partitioned", ["orders"])
+    _create_constraints_and_indexes(["id", "created_at"])
+
+    op.create_table(
+        "orders_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("products", JSONB(), nullable=False),
+        sa.Column("total_price", sa.Float(), nullable=False),
+        sa.Column("status", AutoString(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+    )
+    op.create_index("ix_orders_archive_user_id_id", "orders_archive", ["user_id", "id"])
+
+
+def downgrade() -> None:
+    op.execute("LOCK TABLE orders IN SHARE MODE")
+
+    op.execute(TABLE.format(name="orders_unpartitioned", options=""))
+    _swap("orders_unpartitioned", ["orders_archive", "orders"])
+    op.drop_table("orders_archive")
+    _create_constraints_and_indexes(["id"])
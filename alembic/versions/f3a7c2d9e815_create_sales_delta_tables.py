@@ -0,0 +1,67 @@
+"""create sales delta tables
+
+Revision ID: f3a7c2d9e815
+Revises: c4a9e1f7d2b3
+Create Date: 2026-10-18 14:06:29.317540
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f3a7c2d9e815"
+down_revision: Union[str, None] = "c4a9e1f7d2b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sales_deltas",
+        sa.Column("id", sa.BigInteger()),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "product_sales_deltas",
+        sa.Column("id", sa.BigInteger()),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    # Fold the remaining deltas into the rollups, so no sales are lost.
+    op.execute(
+        """
+        INSERT INTO daily_sales (day, status, orders, revenue)
+        SELECT day, status, sum(orders), sum(revenue) FROM sales_deltas
+        GROUP BY 1, 2
+        ON CONFLICT (day, status) DO UPDATE
+        SET orders = daily_sales.orders + excluded.orders,
+            revenue = daily_sales.revenue + excluded.revenue
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO daily_product_sales (day, product_id, quantity, revenue)
+        SELECT day, product_id, sum(quantity), sum(revenue)
+        FROM product_sales_deltas
+        GROUP BY 1, 2
+        ON CONFLICT (day, product_id) DO UPDATE
+        SET quantity = daily_product_sales.quantity + excluded.quantity,
+            revenue = daily_product_sales.revenue + excluded.revenue
+        """
+    )
+    op.drop_table("product_sales_deltas")
+    op.drop_table("sales_deltas")
@@ -0,0 +1,6 @@
+from .routes import router as router
+
+from .models import DailySales as DailySales
+from .models import DailyProductSales as DailyProductSales
+from .models import SalesDelta as SalesDelta
+from .models import ProductSalesDelta as ProductSalesDelta
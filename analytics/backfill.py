@@ -0,0 +1,38 @@
+"""
+Rebuild the sales rollups from the existing orders.
+
+Usage: python -m analytics.backfill [--chunk-size N]
+"""
+
+from argparse import ArgumentParser
+
+import asyncio
+import logging
+
+from config import settings
+
+from database import engine
+
+from .service import rebuild
+
+
+async def main(chunk_size: int):
+    try:
+        max_id = await rebuild(chunk_size)
+    finally:
+        await engine.dispose()
+    logging.info("Rebuilt the sales rollups from orders up to id %d", max_id)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Rebuild the sales rollups from orders.")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=settings.ANALYTICS_BACKFILL_CHUNK_SIZE,
+        help="number of order IDs to aggregate per statement",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    asyncio.run(main(args.chunk_size))
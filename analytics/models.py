@@ -0,0 +1,59 @@
+from datetime import date
+
+from typing import Optional
+
+from sqlmodel import SQLModel, Field
+
+
+class DailySales(SQLModel, table=True):
+    __tablename__ = "daily_sales"
+
+    day: date = Field(primary_key=True)
+    status: str = Field(primary_key=True)
+
+    orders: int = Field(nullable=False, default=0)
+    revenue: float = Field(nullable=False, default=0.0)
+
+
+class DailyProductSales(SQLModel, table=True):
+    __tablename__ = "daily_product_sales"
+
+    day: date = Field(primary_key=True)
+    product_id: int = Field(primary_key=True)
+
+    quantity: int = Field(nullable=False, default=0)
+    revenue: float = Field(nullable=False, default=0.0)
+
+
+class SalesDelta(SQLModel, table=True):
+    """
+    A change to `daily_sales` recorded by an order transaction and not yet
+    compacted into it.
+    """
+
+    __tablename__ = "sales_deltas"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    day: date = Field(nullable=False)
+    status: str = Field(nullable=False)
+
+    orders: int = Field(nullable=False)
+    revenue: float = Field(nullable=False)
+
+
+class ProductSalesDelta(SQLModel, table=True):
+    """
+    A change to `daily_product_sales` recorded by an order transaction and
+    not yet compacted into it.
+    """
+
+    __tablename__ = "product_sales_deltas"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    day: date = Field(nullable=False)
+    product_id: int = Field(nullable=False)
+
+    quantity: int = Field(nullable=False)
+    revenue: float = Field(nullable=False)
@@ -0,0 +1,50 @@
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from fastapi import APIRouter, Depends, Query
+
+from typing import Annotated, List, Literal, Optional
+
+from datetime import date
+
+from database import get_db_read_session
+
+from users import User
+
+from auth import admin
+
+from . import service
+from .schemas import DailyRevenue, ProductSales, StatusTotals
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+@router.get("/revenue/", response_model=List[DailyRevenue])
+async def get_daily_revenue(
+    current_user: Annotated[User, Depends(admin)],
+    db_session: Annotated[AsyncSession, Depends(get_db_read_session)],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    return await service.get_daily_revenue(db_session, date_from, date_to)
+
+
+@router.get("/statuses/", response_model=List[StatusTotals])
+async def get_status_totals(
+    current_user: Annotated[User, Depends(admin)],
+    db_session: Annotated[AsyncSession, Depends(get_db_read_session)],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    return await service.get_status_totals(db_session, date_from, date_to)
+
+
+@router.get("/products/", response_model=List[ProductSales])
+async def get_top_products(
+    current_user: Annotated[User, Depends(admin)],
+    db_session: Annotated[AsyncSession, Depends(get_db_read_session)],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    by: Literal["quantity", "revenue"] = "quantity",
+):
+    return await service.get_top_products(db_session, date_from, date_to, limit, by)
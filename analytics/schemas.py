@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+
+from datetime import date
+
+
+class DailyRevenue(BaseModel):
+    day: date
+    orders: int
+    revenue: float
+
+
+class StatusTotals(BaseModel):
+    status: str
+    orders: int
+    revenue: float
+
+
+class ProductSales(BaseModel):
+    product_id: int
+    quantity: int
+    revenue: float
@@ -0,0 +1,478 @@
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from sqlmodel import select
+
+from sqlalchemy import func, text, union_all
+from sqlalchemy.dialects.postgresql import insert
+
+from typing import Dict, Iterable, List, Literal, Optional, Tuple
+
+from datetime import date
+
+import asyncio
+import logging
+
+from config import settings
+
+from database import engine
+from database.session import session_maker
+
+from orders.models import Order, Status
+
+from .models import DailySales, DailyProductSales, ProductSalesDelta, SalesDelta
+from .schemas import DailyRevenue, ProductSales, StatusTotals
+
+logger = logging.getLogger(__name__)
+
+Deltas = Dict[tuple, Tuple[int, float]]
+
+# Canceled orders are kept in the per-status rollup but don't count as sales.
+NOT_SOLD = "canceled"
+
+# Advisory lock held while the deltas are compacted or the rollups rebuilt.
+ROLLUP_LOCK = 0x5A1E5
+
+
+def _add_order(sales: Deltas, order: Order, status: Status, sign: int):
+    key = (order.created_at.date(), status)
+    count, revenue = sales.get(key, (0, 0.0))
+    sales[key] = (count + sign, revenue + sign * order.total_price)
+
+
+def _add_products(product_sales: Deltas, order: Order, sign: int):
+    for product_id, item in order.products.items():
+        key = (order.created_at.date(), int(product_id))
+        quantity, revenue = product_sales.get(key, (0, 0.0))
+        product_sales[key] = (
+            quantity + sign * item["quantity"],
+            revenue + sign * item["price"],
+        )
+
+
+async def _append(
+    model, keys: Tuple[str, str], counters: Tuple[str, str], deltas, db_session
+):
+    if not deltas:
+        return
+    # Deltas are appended rather than added to the rollup rows, so
+    # concurrent order transactions don't wait on each other's row locks.
+    await db_session.execute(
+        insert(model).values(
+            [dict(zip(keys + counters, key + values)) for key, values in deltas.items()]
+        )
+    )
+
+
+async def _apply_deltas(sales: Deltas, product_sales: Deltas, db_session: AsyncSession):
+    await _append(
+        SalesDelta, ("day", "status"), ("orders", "revenue"), sales, db_session
+    )
+    await _append(
+        ProductSalesDelta,
+        ("day", "product_id"),
+        ("quantity", "revenue"),
+        product_sales,
+        db_session,
+    )
+
+
+async def record_orders(orders: Iterable[Order], db_session: AsyncSession):
+    """
+    Record the sales of newly created orders. Does not commit.
+
+    Args:
+        orders (Iterable[Order]): The created orders.
+        db_session (AsyncSession): The asynchronous database session.
+    """
+    sales, product_sales = {}, {}
+    for order in orders:
+        _add_order(sales, order, order.status, 1)
+        if order.status != NOT_SOLD:
+            _add_products(product_sales, order, 1)
+
+    await _apply_deltas(sales, product_sales, db_session)
+
+
+async def record_status_change(
+    order: Order, old_status: Status, db_session: AsyncSession
+):
+    """
+    Record an order moving from its old status to its current one.
+    Does not commit.
+
+    Args:
+        order (Order): The order, with its new status set.
+        old_status (Status): The status the order had before.
+        db_session (AsyncSession): The asynchronous database session.
+    """
+    if order.status == old_status:
+        return
+
+    sales, product_sales = {}, {}
+    _add_order(sales, order, old_status, -1)
+    _add_order(sales, order, order.status, 1)
+    if order.status == NOT_SOLD:
+        _add_products(product_sales, order, -1)
+    elif old_status == NOT_SOLD:
+        _add_products(product_sales, order, 1)
+
+    await _apply_deltas(sales, product_sales, db_session)
+
+
+def _sales():
+    # The rollups plus the deltas not yet compacted into them.
+    return union_all(
+        select(
+            DailySales.day, DailySales.status, DailySales.orders, DailySales.revenue
+        ),
+        select(
+            SalesDelta.day, SalesDelta.status, SalesDelta.orders, SalesDelta.revenue
+        ),
+    ).subquery()
+
+
+def _product_sales():
+    return union_all(
+        select(
+            DailyProductSales.day,
+            DailyProductSales.product_id,
+            DailyProductSales.quantity,
+            DailyProductSales.revenue,
+        ),
+        select(
+            ProductSalesDelta.day,
+            ProductSalesDelta.product_id,
+            ProductSalesDelta.quantity,
+            ProductSalesDelta.revenue,
+        ),
+    ).subquery()
+
+
+def _in_range(query, day, date_from: Optional[date], date_to: Optional[date]):
+    if date_from is not None:
+        query = query.where(day >= date_from)
+    if date_to is not None:
+        query = query.where(day <= date_to)
+    return query
+
+
+async def get_daily_revenue(
+    db_session: AsyncSession,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> List[DailyRevenue]:
+    """
+    Retrieve the number of orders and the revenue per day, canceled orders excluded.
+
+    Args:
+        db_session (AsyncSession): The asynchronous database session.
+        date_from (Optional[date]): The first day to include.
+        date_to (Optional[date]): The last day to include.
+
+    Returns:
+        List[DailyRevenue]: One entry per day with orders, in date order.
+    """
+    sales = _sales()
+    query = _in_range(
+        select(
+            sales.c.day,
+            func.sum(sales.c.orders),
+            func.sum(sales.c.revenue),
+        ).where(sales.c.status != NOT_SOLD),
+        sales.c.day,
+        date_from,
+        date_to,
+    )
+    res = await db_session.exec(query.group_by(sales.c.day).order_by(sales.c.day))
+
+    return [
+        DailyRevenue(day=day, orders=orders, revenue=revenue)
+        for day, orders, revenue in res.all()
+        if orders
+    ]
+
+
+async def get_status_totals(
+    db_session: AsyncSession,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> List[StatusTotals]:
+    """
+    Retrieve the number of orders and their total value per status.
+
+    Args:
+        db_session (AsyncSession): The asynchronous database session.
+        date_from (Optional[date]): The first day to include.
+        date_to (Optional[date]): The last day to include.
+
+    Returns:
+        List[StatusTotals]: One entry per status.
+    """
+    sales = _sales()
+    query = _in_range(
+        select(
+            sales.c.status,
+            func.sum(sales.c.orders),
+            func.sum(sales.c.revenue),
+        ),
+        sales.c.day,
+        date_from,
+        date_to,
+    )
+    res = await db_session.exec(query.group_by(sales.c.status).order_by(sales.c.status))
+
+    return [
+        StatusTotals(status=status, orders=orders, revenue=revenue)
+        for status, orders, revenue in res.all()
+    ]
+
+
+async def get_top_products(
+    db_session: AsyncSession,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = 10,
+    by: Literal["quantity", "revenue"] = "quantity",
+) -> List[ProductSales]:
+    """
+    Retrieve the best-selling products, canceled orders excluded.
+
+    Args:
+        db_session (AsyncSession): The asynchronous database session.
+        date_from (Optional[date]): The first day to include.
+        date_to (Optional[date]): The last day to include.
+        limit (int): The maximum number of products to return.
+        by (str): Rank products by "quantity" sold or by "revenue".
+
+    Returns:
+        List[ProductSales]: The top products, best-selling first.
+    """
+    sales = _product_sales()
+    quantity = func.sum(sales.c.quantity)
+    revenue = func.sum(sales.c.revenue)
+    query = _in_range(
+        select(sales.c.product_id, quantity, revenue),
+        sales.c.day,
+        date_from,
+        date_to,
+    )
+    res = await db_session.exec(
+        query.group_by(sales.c.product_id)
+        .having(quantity > 0)
+        .order_by(
+            (quantity if by == "quantity" else revenue).desc(),
+            sales.c.product_id,
+        )
+        .limit(limit)
+    )
+
+    return [
+        ProductSales(product_id=product_id, quantity=quantity, revenue=revenue)
+        for product_id, quantity, revenue in res.all()
+    ]
+
+
+COMPACT_SALES = text(
+    """
+    WITH moved AS (
+        DELETE FROM sales_deltas RETURNING day, status, orders, revenue
+    )
+    INSERT INTO daily_sales (day, status, orders, revenue)
+    SELECT day, status, sum(orders), sum(revenue) FROM moved
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    ON CONFLICT (day, status) DO UPDATE
+    SET orders = daily_sales.orders + excluded.orders,
+        revenue = daily_sales.revenue + excluded.revenue
+    """
+)
+
+COMPACT_PRODUCT_SALES = text(
+    """
+    WITH moved AS (
+        DELETE FROM product_sales_deltas
+        RETURNING day, product_id, quantity, revenue
+    )
+    INSERT INTO daily_product_sales (day, product_id, quantity, revenue)
+    SELECT day, product_id, sum(quantity), sum(revenue) FROM moved
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    ON CONFLICT (day, product_id) DO UPDATE
+    SET quantity = daily_product_sales.quantity + excluded.quantity,
+        revenue = daily_product_sales.revenue + excluded.revenue
+    """
+)
+
+
+async def compact(db_session: AsyncSession) -> bool:
+    """
+    Fold the recorded deltas into the rollups, in one transaction.
+
+    Only one compaction runs at a time, and none while the rollups are
+    being rebuilt.
+
+    Args:
+        db_session (AsyncSession): The asynchronous database session.
+
+    Returns:
+        bool: False if another compaction or a rebuild was running.
+    """
+    res = await db_session.execute(
+        text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ROLLUP_LOCK}
+    )
+    if not res.scalar():
+        await db_session.rollback()
+        return False
+
+    await db_session.execute(COMPACT_SALES)
+    await db_session.execute(COMPACT_PRODUCT_SALES)
+    await db_session.commit()
+    return True
+
+
+async def compact_periodically():
+    """
+    Periodically compact the recorded deltas into the rollups.
+
+    The interval is taken from `ANALYTICS_COMPACTION_INTERVAL`;
+    a non-positive value disables the compaction.
+    """
+    if settings.ANALYTICS_COMPACTION_INTERVAL <= 0:
+        return
+    while True:
+        await asyncio.sleep(settings.ANALYTICS_COMPACTION_INTERVAL)
+        try:
+            async with session_maker() as db_session:
+                await compact(db_session)
+        except Exception:
+            logger.exception("Failed to compact the sales rollups")
+
+
+# The rollups are rebuilt into copies named <table>_rebuild.
+ROLLUP_TABLES = ("daily_sales", "daily_product_sales")
+
+BACKFILL_SALES = text(
+    """
+    INSERT INTO daily_sales_rebuild (day, status, orders, revenue)
+    SELECT CAST(created_at AS date), status, count(*), sum(total_price)
+    FROM (
+        SELECT created_at, status, total_price FROM orders
+        WHERE id > :lo AND id <= :hi
+        UNION ALL
+        SELECT created_at, status, total_price FROM orders_archive
+        WHERE id > :lo AND id <= :hi
+    ) AS o
+    GROUP BY 1, 2
+    ON CONFLICT (day, status) DO UPDATE
+    SET orders = daily_sales_rebuild.orders + excluded.orders,
+        revenue = daily_sales_rebuild.revenue + excluded.revenue
+    """
+)
+
+BACKFILL_PRODUCT_SALES = text(
+    """
+    INSERT INTO daily_product_sales_rebuild (day, product_id, quantity, revenue)
+    SELECT
+        CAST(o.created_at AS date),
+        CAST(item.key AS integer),
+        sum(CAST(item.value ->> 'quantity' AS integer)),
+        sum(CAST(item.value ->> 'price' AS float))
+    FROM (
+        SELECT created_at, products FROM orders
+        WHERE id > :lo AND id <= :hi AND status <> :not_sold
+        UNION ALL
+        SELECT created_at, products FROM orders_archive
+        WHERE id > :lo AND id <= :hi AND status <> :not_sold
+    ) AS o
+    CROSS JOIN LATERAL jsonb_each(o.products) AS item
+    GROUP BY 1, 2
+    ON CONFLICT (day, product_id) DO UPDATE
+    SET quantity = daily_product_sales_rebuild.quantity + excluded.quantity,
+        revenue = daily_product_sales_rebuild.revenue + excluded.revenue
+    """
+)
+
+
+async def rebuild(chunk_size: int = settings.ANALYTICS_BACKFILL_CHUNK_SIZE) -> int:
+    """
+    Rebuild the rollups from the orders and archived orders tables.
+
+    The rollups are rebuilt into empty copies while the current ones keep
+    serving reads, and the copies replace them in one short transaction at
+    the end. Orders are aggregated in ID ranges of `chunk_size`, all in one
+    REPEATABLE READ transaction, so they are read as of the snapshot taken
+    when the rebuild starts. The deltas visible in that snapshot are
+    compacted into the rollups being replaced, while the deltas committed
+    after it, which record the orders created and the statuses changed
+    since, are kept and compacted into the rebuilt rollups, so every change
+    is counted once.
+
+    Args:
+        chunk_size (int): The number of order IDs to aggregate per statement.
+
+    Returns:
+        int: The highest order ID included in the rebuild.
+    """
+    # Held on its own connection for the whole rebuild, to keep compaction
+    # from writing to the rollups that are about to be replaced.
+    async with engine.connect() as lock:
+        await lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ROLLUP_LOCK})
+        await lock.commit()
+        try:
+            max_id = await _rebuild(chunk_size)
+        finally:
+            await lock.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": ROLLUP_LOCK}
+            )
+            await lock.commit()
+
+    return max_id
+
+
+async def _rebuild(chunk_size: int) -> int:
+    async with session_maker() as db_session:
+        for table in ROLLUP_TABLES:
+            await db_session.execute(text(f"DROP TABLE IF EXISTS {table}_rebuild"))
+            await db_session.execute(
+                text(f"CREATE TABLE {table}_rebuild (LIKE {table} INCLUDING ALL)")
+            )
+        await db_session.commit()
+
+    # Everything is read from one REPEATABLE READ transaction. An order and
+    # its deltas are committed together, so the deltas this transaction sees
+    # are exactly those of the order changes it rolls up; only they are
+    # compacted here, into the rollups being replaced.
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="REPEATABLE READ")
+        await conn.execute(COMPACT_SALES)
+        await conn.execute(COMPACT_PRODUCT_SALES)
+        res = await conn.execute(
+            text(
+                "SELECT greatest("
+                "(SELECT max(id) FROM orders), (SELECT max(id) FROM orders_archive))"
+            )
+        )
+        max_id = res.scalar() or 0
+
+        lo = 0
+        while lo < max_id:
+            hi = min(lo + chunk_size, max_id)
+            params = {"lo": lo, "hi": hi, "not_sold": NOT_SOLD}
+            await conn.execute(BACKFILL_SALES, params)
+            await conn.execute(BACKFILL_PRODUCT_SALES, params)
+            logger.info("Rolled up orders %d-%d of %d", lo + 1, hi, max_id)
+            lo = hi
+        await conn.commit()
+
+    async with session_maker() as db_session:
+        for table in ROLLUP_TABLES:
+            await db_session.execute(text(f"DROP TABLE {table}"))
+            await db_session.execute(
+                text(f"ALTER TABLE {table}_rebuild RENAME TO {table}")
+            )
+            await db_session.execute(
+                text(f"ALTER INDEX {table}_rebuild_pkey RENAME TO {table}_pkey")
+            )
+        await db_session.commit()
+
+    return max_id
@@ -1,5 +1,13 @@
 from fastapi import FastAPI
 
+from contextlib import asynccontextmanager, suppress
+
+import asyncio
+import logging
+
+from config import settings
+
+from database import engine, read_engine, log_pool_stats
 from users import router as users_router
 from auth import router as auth_router
 from categories import router as categories_router
@@ -7,9 +15,61 @@ from products import router as products_router
 from carts import router as carts_router
 from orders import router as orders_router
 from reservations import router as reservations_router
+from analytics import router as analytics_router
+from analytics.service import compact_periodically
+from catalog import listen_for_changes
+from carts.store import cart_store
+from orders.board import kitchen_board
+from orders.events import order_events
+from orders.partitions import create_partitions_periodically, ensure_partitions
+from orders.service import cleanup_idempotency_keys, order_intake
+from database.routes import router as database_router
+
+logging.basicConfig(level=settings.LOG_LEVEL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_partitions()
+    pool_stats_task = asyncio.create_task(log_pool_stats())
+    idempotency_cleanup_task = asyncio.create_task(cleanup_idempotency_keys())
+    analytics_compaction_task = asyncio.create_task(compact_periodically())
+    partitions_task = asyncio.create_task(create_partitions_periodically())
+    if cart_store is not None:
+        await cart_store.open()
+        cart_flush_task = asyncio.create_task(cart_store.run_flusher())
+    if order_intake is not None:
+        order_intake_task = asyncio.create_task(order_intake.run())
+    if order_events.notify:
+        order_events_task = asyncio.create_task(order_events.listen())
+    if settings.CATALOG_CHANGES_NOTIFY:
+        catalog_changes_task = asyncio.create_task(listen_for_changes())
+    kitchen_board_task = asyncio.create_task(kitchen_board.run())
+    yield
+    kitchen_board_task.cancel()
+    if settings.CATALOG_CHANGES_NOTIFY:
+        catalog_changes_task.cancel()
+    if order_events.notify:
+        order_events_task.cancel()
+    if order_intake is not None:
+        await order_intake.close()
+        order_intake_task.cancel()
+    pool_stats_task.cancel()
+    idempotency_cleanup_task.cancel()
+    analytics_compaction_task.cancel()
+    partitions_task.cancel()
+    if cart_store is not None:
+        cart_flush_task.cancel()
+        # Wait for the flusher to stop, so that it never flushes alongside close.
+        with suppress(asyncio.CancelledError):
+            await cart_flush_task
+        await cart_store.close()
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
 
 
-app = FastAPI(title="Restaraunt API", version="v1")
+app = FastAPI(title="Restaraunt API", version="v1", lifespan=lifespan)
 
 app.include_router(users_router)
 app.include_router(auth_router)
@@ -18,3 +78,5 @@ app.include_router(products_router)
 app.include_router(carts_router)
 app.include_router(orders_router)
 app.include_router(reservations_router)
+app.include_router(analytics_router)
+app.include_router(database_router)
@@ -1,4 +1,5 @@
 from .routes import router as router
 
 from .dependencies import get_current_user as get_current_user
+from .dependencies import get_authorized_user as get_authorized_user
 from .dependencies import admin as admin
@@ -1,4 +1,4 @@
-from typing import Annotated, TYPE_CHECKING
+from typing import Annotated, Union
 
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer
@@ -8,27 +8,68 @@ from sqlalchemy.ext.asyncio.session import AsyncSession
 from database import get_db_session
 
 from users import service as users_service
+from users.cache import user_cache
+from users.models import User
 
 from http_exceptions import AccessDenied
 
-from .utils import decode_token
+from config import settings
 
-if TYPE_CHECKING:
-    from users import User
+from .schemas import TokenUser
+from .utils import decode_token
 
 access_token_bearer = HTTPBearer(description="Access token bearer")
 
 
+async def _load_user(token_data: dict, db_session: AsyncSession) -> User:
+    user_id = int(token_data["sub"])
+
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await users_service.get(id=user_id, db_session=db_session)
+        user_cache.set(user_id, User.model_validate(user))
+
+    if token_data.get("ver", user.token_version) != user.token_version:
+        raise HTTPException(status_code=403, detail="Revoked token")
+    return user
+
+
 async def get_current_user(
     bearer: Annotated[str, Depends(access_token_bearer)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
 ):
     token_data: dict = decode_token(token=bearer.credentials)
-    return await users_service.get(id=int(token_data["sub"]), db_session=db_session)
+    return await _load_user(token_data, db_session)
+
+
+async def get_authorized_user(
+    bearer: Annotated[str, Depends(access_token_bearer)],
+    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+) -> Union[TokenUser, User]:
+    """
+    Authorize the bearer of an access token.
+
+    With `ACCESS_TOKEN_STATELESS` enabled the id and role are taken from the
+    token claims, and only the user's token version is checked, from a
+    short-lived cache: a token is revoked at most
+    `ACCESS_TOKEN_VERSION_CACHE_TTL` seconds after the user's password or
+    role has changed. Otherwise the full user is loaded as in
+    `get_current_user`. Use it in routes that only need the user's id and
+    role.
+    """
+    token_data: dict = decode_token(token=bearer.credentials)
+    if not settings.ACCESS_TOKEN_STATELESS or "role" not in token_data:
+        return await _load_user(token_data, db_session)
+
+    user_id = int(token_data["sub"])
+    version = await users_service.get_token_version(user_id, db_session)
+    if version is None or token_data.get("ver") != version:
+        raise HTTPException(status_code=403, detail="Revoked token")
+    return TokenUser(id=user_id, role=token_data["role"])
 
 
 async def admin(
-    current_user: Annotated["User", Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
 ):
     if current_user.role != "admin":
         raise AccessDenied()
@@ -10,9 +10,12 @@ from database import get_db_session
 
 from config import settings
 
+from users.models import User
+
 from .service import auth_user
 from .schemas import LoginSchema
-from .utils import create_access_token
+from .dependencies import admin
+from .utils import create_access_token, hashing_stats, token_cache
 
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
@@ -29,3 +32,17 @@ async def get_access_token(
         "access_token": create_access_token(user),
         "expires_at": int(time.time() + settings.ACCESS_TOKEN_EXPIRATION_TIME * 60),
     }
+
+
+@router.get("/hashing/", response_model=Dict[str, Union[int, float]])
+async def get_password_hashing_stats(
+    current_user: Annotated[User, Depends(admin)],
+):
+    return hashing_stats.snapshot()
+
+
+@router.get("/tokens/", response_model=Dict[str, Union[int, float]])
+async def get_token_cache_stats(
+    current_user: Annotated[User, Depends(admin)],
+):
+    return token_cache.stats()
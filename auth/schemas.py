@@ -4,6 +4,8 @@ from pydantic import BaseModel, field_validator
 
 from fastapi import HTTPException
 
+from users.models import Role
+
 
 class LoginSchema(BaseModel):
     phone_number: str
@@ -17,3 +19,8 @@ class LoginSchema(BaseModel):
                 detail="Invalid phone number format",
             )
         return value
+
+
+class TokenUser(BaseModel):
+    id: int
+    role: Role
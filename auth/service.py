@@ -4,7 +4,7 @@ from fastapi import HTTPException
 
 from users import service as users_service
 
-from .utils import verify_password
+from .utils import verify_password_async
 from .schemas import LoginSchema
 
 
@@ -19,6 +19,7 @@ async def auth_user(credentials: LoginSchema, db_session: AsyncSession):
     Raises:
         HTTPException: 
             - 403 if the credentials are invalid (wrong phone number or password).
+            - 503 if too many passwords are being verified at once.
 
     Returns:
         User: The authenticated user instance.
@@ -27,6 +28,6 @@ async def auth_user(credentials: LoginSchema, db_session: AsyncSession):
         credentials.phone_number, db_session
     )
     if user:
-        if verify_password(credentials.password, user.hashed_password):
+        if await verify_password_async(credentials.password, user.hashed_password):
             return user
     raise HTTPException(status_code=403, detail="Invalid credentials")
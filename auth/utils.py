@@ -1,21 +1,75 @@
 from passlib.context import CryptContext
 
+from concurrent.futures import ThreadPoolExecutor
+
 import jwt
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
 
 from fastapi import HTTPException
 
-from typing import Dict, TYPE_CHECKING
+from typing import Callable, Dict, TYPE_CHECKING, TypeVar, Union
 
+import asyncio
+import hashlib
 import time
 
+from cache import TTLCache
+
 from config import settings
 
 if TYPE_CHECKING:
     from users import User
 
+T = TypeVar("T")
+
 crypt_context: CryptContext = CryptContext(schemes=["bcrypt"])
 
+hashing_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASHING_MAX_CONCURRENCY,
+    thread_name_prefix="password-hashing",
+)
+hashing_semaphore = asyncio.Semaphore(settings.PASSWORD_HASHING_MAX_CONCURRENCY)
+
+
+class HashingStats:
+    def __init__(self):
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def snapshot(self) -> Dict[str, Union[int, float]]:
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": (
+                round(self.total_wait / self.completed * 1000, 3)
+                if self.completed
+                else 0.0
+            ),
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "avg_time_ms": (
+                round(self.total_time / self.completed * 1000, 3)
+                if self.completed
+                else 0.0
+            ),
+            "max_time_ms": round(self.max_time * 1000, 3),
+        }
+
+
+hashing_stats = HashingStats()
+
+token_cache = TTLCache(
+    maxsize=settings.ACCESS_TOKEN_CACHE_SIZE,
+    ttl=settings.ACCESS_TOKEN_EXPIRATION_TIME,
+)
+
 
 def hash_password(password: str) -> str:
     return crypt_context.hash(password)
@@ -25,12 +79,69 @@ def verify_password(password: str, hashed_password: str) -> bool:
     return crypt_context.verify(password, hashed_password)
 
 
+async def _run_hashing(func: Callable[..., T], *args) -> T:
+    """
+    Run a password hashing function in the hashing thread pool.
+
+    At most `PASSWORD_HASHING_MAX_CONCURRENCY` calls run at once; callers
+    waiting longer than `PASSWORD_HASHING_QUEUE_TIMEOUT` seconds are rejected.
+
+    Raises:
+        HTTPException:
+            - 503 if the hashing queue is full for too long.
+    """
+    start = time.perf_counter()
+    hashing_stats.queued += 1
+    try:
+        # Unlike wait_for, the timeout cancels the acquire itself, which then
+        # gives back a permit granted at the same moment instead of leaking it.
+        async with asyncio.timeout(settings.PASSWORD_HASHING_QUEUE_TIMEOUT):
+            await hashing_semaphore.acquire()
+    except TimeoutError:
+        hashing_stats.rejected += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Too many concurrent requests, try again later",
+            headers={"Retry-After": "1"},
+        )
+    finally:
+        hashing_stats.queued -= 1
+
+    # Only reached with a permit: a cancelled or timed out acquire raises.
+    wait = time.perf_counter() - start
+    hashing_stats.running += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            hashing_executor, func, *args
+        )
+    finally:
+        hashing_semaphore.release()
+        elapsed = time.perf_counter() - start - wait
+        hashing_stats.running -= 1
+        hashing_stats.completed += 1
+        hashing_stats.total_wait += wait
+        hashing_stats.max_wait = max(hashing_stats.max_wait, wait)
+        hashing_stats.total_time += elapsed
+        hashing_stats.max_time = max(hashing_stats.max_time, elapsed)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    return await _run_hashing(verify_password, password, hashed_password)
+
+
 def create_access_token(user: "User") -> str:
     claims = {
         "sub": str(user.id),
         "iat": int(time.time()),
         "exp": int(time.time()) + settings.ACCESS_TOKEN_EXPIRATION_TIME,
     }
+    if settings.ACCESS_TOKEN_STATELESS:
+        claims["role"] = user.role
+        claims["ver"] = user.token_version
 
     return jwt.encode(
         headers={"alg": "HS256", "typ": "JWT"},
@@ -40,13 +151,34 @@ def create_access_token(user: "User") -> str:
 
 
 def decode_token(token: str) -> Dict:
+    """
+    Verify an access token and return its claims.
+
+    Verified claims are cached until the token expires, so repeated requests
+    with the same token skip the signature check. The cache key is a digest
+    of the signature secret and the token, so tokens cached under a previous
+    secret are never served after it is rotated.
+
+    Raises:
+        HTTPException:
+            - 403 if the token is expired or invalid.
+    """
+    secret = settings.ACCESS_TOKEN_SIGNATURE_SECRET
+    key = hashlib.sha256(f"{secret}:{token}".encode()).digest()
+    token_data = token_cache.get(key)
+    if token_data is not None:
+        if token_data["exp"] <= time.time():
+            token_cache.pop(key)
+            raise HTTPException(status_code=403, detail="Expired token")
+        return dict(token_data)
+
     try:
-        token_data: Dict = jwt.decode(
-            jwt=token, key=settings.ACCESS_TOKEN_SIGNATURE_SECRET, algorithms=["HS256"]
-        )
+        token_data: Dict = jwt.decode(jwt=token, key=secret, algorithms=["HS256"])
     except ExpiredSignatureError:
         raise HTTPException(status_code=403, detail="Expired token")
     except InvalidTokenError:
         raise HTTPException(status_code=403, detail="Invalid token")
 
+    if "exp" in token_data:
+        token_cache.set(key, dict(token_data), ttl=token_data["exp"] - time.time())
     return token_data
@@ -1,3 +1,4 @@
 from .routes import router as router
 
 from .models import Cart as Cart
+from .models import CartItem as CartItem
@@ -1,16 +1,37 @@
-from typing import Union
+from typing import Sequence, Union
 
 from sqlmodel import SQLModel, Field
 
-import sqlalchemy as sa
 
+class CartItem(SQLModel, table=True):
+    __tablename__ = "cart_items"
 
-class Cart(SQLModel, table=True):
-    __tablename__ = "carts"
+    user_id: int = Field(primary_key=True, foreign_key="users.id", ondelete="CASCADE")
+    product_id: int = Field(
+        primary_key=True, foreign_key="products.id", ondelete="CASCADE"
+    )
 
-    user_id: int = Field(primary_key=True, foreign_key="users.id", unique=True)
+    quantity: int = Field(nullable=False)
+    unit_price: float = Field(nullable=False)
 
-    products: dict[str, dict[str, Union[int, float]]] = Field(
-        sa_column=sa.Column("products", sa.JSON(), nullable=False, default={})
-    )
-    total_price: float = Field(nullable=False, default=0.0)
+
+class Cart(SQLModel):
+    user_id: int
+
+    products: dict[str, dict[str, Union[int, float]]] = {}
+    total_price: float = 0.0
+
+    @classmethod
+    def from_items(cls, user_id: int, items: Sequence[CartItem]) -> "Cart":
+        products = {
+            str(item.product_id): {
+                "quantity": item.quantity,
+                "price": item.unit_price * item.quantity,
+            }
+            for item in items
+        }
+        return cls(
+            user_id=user_id,
+            products=products,
+            total_price=sum(v["price"] for v in products.values()),
+        )
@@ -1,18 +1,20 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 
-from typing import Annotated, Dict, Union
+from typing import Annotated, Dict, List, Union
 
 from database import get_db_session
 
-from auth import get_current_user
+from auth import get_authorized_user, admin
 
 from users import User
 
 from . import service
 
 from .models import Cart
+from .schemas import CartItemQuantitySchema
+from .store import cart_store
 
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
@@ -20,16 +22,25 @@ router = APIRouter(prefix="/cart", tags=["Cart"])
 
 @router.get("/", response_model=Cart)
 async def get_current_user_cart(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
 ):
     return await service.get(current_user.id, db_session)
 
 
+@router.patch("/", response_model=Dict[str, Union[str, Cart]])
+async def set_quantities_in_current_user_cart(
+    items: List[CartItemQuantitySchema],
+    current_user: Annotated[User, Depends(get_authorized_user)],
+    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+):
+    return await service.set_quantities(current_user.id, items, db_session)
+
+
 @router.patch("/add/{product_id}", response_model=Dict[str, Union[str, Cart]])
 async def add_product_to_current_user_cart(
     product_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
 ):
     return await service.add_product(current_user.id, product_id, db_session)
@@ -39,7 +50,7 @@ async def add_product_to_current_user_cart(
 async def set_quantity_for_product_in_current_user_cart(
     product_id: int,
     quantity: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
 ):
     return await service.set_quantity_for_product(
@@ -50,7 +61,16 @@ async def set_quantity_for_product_in_current_user_cart(
 @router.patch("/remove/{product_id}", response_model=Dict[str, Union[str, Cart]])
 async def remove_product_from_current_user_cart(
     product_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
 ):
     return await service.remove_product(current_user.id, product_id, db_session)
+
+
+@router.get("/store/", response_model=Dict[str, Union[int, float]])
+async def get_cart_store_stats(
+    current_user: Annotated[User, Depends(admin)],
+):
+    if cart_store is None:
+        raise HTTPException(status_code=404, detail="Cart store is not enabled")
+    return cart_store.stats()
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, field_validator
+
+from fastapi import HTTPException
+
+
+class CartItemQuantitySchema(BaseModel):
+    product_id: int
+    quantity: int
+
+    @field_validator("quantity")
+    def validate_quantity(cls, v: int) -> int:
+        if v > 10:
+            raise HTTPException(
+                status_code=400, detail="Max quantity for one product is 10"
+            )
+        return v
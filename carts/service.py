@@ -2,55 +2,142 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 
 from sqlmodel import select
 
+from sqlalchemy import delete, literal, update
+from sqlalchemy.dialects.postgresql import insert
+
 from fastapi import HTTPException
 
+from typing import Iterable, List
+
+from collections import defaultdict
+
+import time
+
 from products import service as products_service
+from products.models import Product
+
+from http_exceptions import ObjectWithIdNotFound
 
-from .models import Cart
+from .models import Cart, CartItem
+from .schemas import CartItemQuantitySchema
+from .store import cart_store
 
 
-async def create(user_id: int, db_session: AsyncSession):
+async def get(user_id: int, db_session: AsyncSession):
     """
-    Create a new cart for a user.
+    Retrieve the cart for a given user, projected from their cart items.
+    Served from the cart store when `CART_STORE` is "memory".
 
     Args:
-        user_id (int): The ID of the user for whom to create the cart.
+        user_id (int): The ID of the user whose cart to retrieve.
         db_session (AsyncSession): The asynchronous database session.
 
     Returns:
-        Cart: The newly created cart instance.
+        Cart: The user's cart. Empty if the user has no cart items.
     """
-    cart = Cart(user_id=user_id)
+    if cart_store is not None:
+        return await cart_store.get(user_id, db_session)
+
+    res = await db_session.exec(
+        select(CartItem)
+        .where(CartItem.user_id == user_id)
+        .order_by(CartItem.product_id)
+    )
+    return Cart.from_items(user_id, res.all())
 
-    db_session.add(cart)
-    await db_session.commit()
-    await db_session.refresh(cart)
 
-    return cart
+async def take(user_id: int, db_session: AsyncSession):
+    """
+    Empty the user's cart and return what it held. Does not commit.
 
+    The cart items are removed with a single DELETE ... RETURNING, which locks
+    them until the transaction ends; a concurrent `take` waits for it and then
+    finds the cart empty, so a cart can only be taken once. Call
+    `commit_taken` after the transaction commits and `release_taken` if it
+    fails, so the cart store follows the database.
 
-async def get(user_id: int, db_session: AsyncSession):
+    Args:
+        user_id (int): The ID of the user whose cart to take.
+        db_session (AsyncSession): The asynchronous database session.
+
+    Returns:
+        Cart: The user's cart as it was before being emptied.
+    """
+    return (await take_many([user_id], db_session))[user_id]
+
+
+async def take_many(user_ids: Iterable[int], db_session: AsyncSession):
     """
-    Retrieve the cart for a given user. Creates a new cart if none exists.
+    Empty the carts of many users with a single statement, like `take`.
+    Does not commit.
 
     Args:
-        user_id (int): The ID of the user whose cart to retrieve.
+        user_ids (Iterable[int]): The IDs of the users whose carts to take.
         db_session (AsyncSession): The asynchronous database session.
 
     Returns:
-        Cart: The user's cart instance.
+        Dict[int, Cart]: Each user's cart as it was before being emptied.
     """
-    res = await db_session.exec(select(Cart).where(Cart.user_id == user_id))
-    cart = res.first()
+    user_ids = list(user_ids)
+
+    if cart_store is not None:
+        carts = {
+            user_id: await cart_store.take(user_id, db_session) for user_id in user_ids
+        }
+        await db_session.execute(delete(CartItem).where(CartItem.user_id.in_(user_ids)))
+        return carts
 
-    if not cart:
-        cart = await create(user_id, db_session)
-    return cart
+    res = await db_session.execute(
+        delete(CartItem).where(CartItem.user_id.in_(user_ids)).returning(CartItem)
+    )
+    items = defaultdict(list)
+    for item in sorted(res.scalars().all(), key=lambda item: item.product_id):
+        items[item.user_id].append(item)
+    return {user_id: Cart.from_items(user_id, items[user_id]) for user_id in user_ids}
+
+
+def commit_taken(user_ids: Iterable[int], db_session: AsyncSession):
+    """
+    Empty the taken carts in the cart store once the transaction that took
+    them has committed.
+
+    Args:
+        user_ids (Iterable[int]): The IDs of the users whose carts were taken.
+        db_session (AsyncSession): The session that took the carts.
+    """
+    if cart_store is not None:
+        for user_id in user_ids:
+            cart_store.commit_take(user_id, db_session)
+
+
+def release_taken(user_ids: Iterable[int], db_session: AsyncSession):
+    """
+    Give the taken carts back to the cart store after the transaction that
+    took them has rolled back.
+
+    Args:
+        user_ids (Iterable[int]): The IDs of the users whose carts were taken.
+        db_session (AsyncSession): The session that took the carts.
+    """
+    if cart_store is not None:
+        for user_id in user_ids:
+            cart_store.release_take(user_id, db_session)
+
+
+def _upsert_item(user_id: int, product_id: int, quantity: int):
+    stmt = insert(CartItem).from_select(
+        ["user_id", "product_id", "quantity", "unit_price"],
+        select(literal(user_id), Product.id, literal(quantity), Product.price).where(
+            Product.id == product_id
+        ),
+    )
+    return stmt, stmt.excluded
 
 
 async def add_product(user_id: int, product_id: int, db_session: AsyncSession):
     """
     Add a product to the user's cart. Increments quantity if product already in cart.
+    The cart item is written with a single UPSERT statement.
 
     Args:
         user_id (int): The ID of the user whose cart to update.
@@ -58,41 +145,39 @@ async def add_product(user_id: int, product_id: int, db_session: AsyncSession):
         db_session (AsyncSession): The asynchronous database session.
 
     Raises:
+        ObjectWithIdNotFound: If no product with the given ID exists.
         HTTPException:
             - 400 if the quantity of the product exceeds 10.
 
     Returns:
         dict: A dictionary containing a success message and the updated cart instance.
     """
-    cart = await get(user_id, db_session)
-
-    product = await products_service.get(product_id, db_session)
-
-    try:
-        if cart.products[str(product_id)]["quantity"] > 9:
-            raise HTTPException(
-                status_code=400, detail="Max quantity for one product is 10"
-            )
-        cart.products = cart.products | {
-            str(product_id): {
-                "quantity": cart.products[str(product_id)]["quantity"] + 1,
-                "price": cart.products[str(product_id)]["price"] + product.price,
-            }
-        }
-    except KeyError:
-        cart.products = cart.products | {
-            str(product_id): {"quantity": 1, "price": product.price}
-        }
-
-    cart.total_price = 0
-    for k, v in cart.products.items():
-        cart.total_price += v["price"]
+    if cart_store is not None:
+        cart = await cart_store.add_product(user_id, product_id, db_session)
+        return {"message": "Product added", "cart": cart}
+
+    stmt, excluded = _upsert_item(user_id, product_id, 1)
+    res = await db_session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[CartItem.user_id, CartItem.product_id],
+            set_={
+                "quantity": CartItem.quantity + 1,
+                "unit_price": excluded.unit_price,
+            },
+            where=CartItem.quantity < 10,
+        ).returning(CartItem.quantity)
+    )
+
+    if res.first() is None:
+        await db_session.rollback()
+        await products_service.get(product_id, db_session, cached=True)
+        raise HTTPException(
+            status_code=400, detail="Max quantity for one product is 10"
+        )
 
-    db_session.add(cart)
     await db_session.commit()
-    await db_session.refresh(cart)
 
-    return {"message": "Product added", "cart": cart}
+    return {"message": "Product added", "cart": await get(user_id, db_session)}
 
 
 async def set_quantity_for_product(
@@ -101,6 +186,7 @@ async def set_quantity_for_product(
     """
     Set the quantity for a specific product in the user's cart.
     Removes the product if quantity is less than 1.
+    The cart item is written with a single UPSERT or DELETE statement.
 
     Args:
         user_id (int): The ID of the user whose cart to update.
@@ -109,39 +195,48 @@ async def set_quantity_for_product(
         db_session (AsyncSession): The asynchronous database session.
 
     Raises:
+        ObjectWithIdNotFound: If no product with the given ID exists.
         HTTPException:
             - 400 if quantity exceeds 10.
 
     Returns:
         dict: A dictionary containing a success message and the updated cart instance.
     """
-    cart = await get(user_id, db_session)
-
-    product = await products_service.get(product_id, db_session)
-
     if quantity > 10:
         raise HTTPException(
             status_code=400, detail="Max quantity for one product is 10"
         )
-    elif quantity < 1:
-        cart.products = {k: v for k, v in cart.products.items() if k != str(product.id)}
-    else:
-        cart.products = cart.products | {
-            str(product.id): {
-                "quantity": quantity,
-                "price": product.price * quantity,
-            }
-        }
 
-    cart.total_price = 0
-    for k, v in cart.products.items():
-        cart.total_price += v["price"]
+    if cart_store is not None:
+        cart = await cart_store.set_quantities(
+            user_id, {product_id: quantity}, db_session
+        )
+        return {"message": "Quantity set", "cart": cart}
+
+    if quantity < 1:
+        await db_session.execute(
+            delete(CartItem).where(
+                CartItem.user_id == user_id, CartItem.product_id == product_id
+            )
+        )
+    else:
+        stmt, excluded = _upsert_item(user_id, product_id, quantity)
+        res = await db_session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[CartItem.user_id, CartItem.product_id],
+                set_={
+                    "quantity": excluded.quantity,
+                    "unit_price": excluded.unit_price,
+                },
+            ).returning(CartItem.quantity)
+        )
+        if res.first() is None:
+            await db_session.rollback()
+            raise ObjectWithIdNotFound(product_id, Product)
 
-    db_session.add(cart)
     await db_session.commit()
-    await db_session.refresh(cart)
 
-    return {"message": "Quantity set", "cart": cart}
+    return {"message": "Quantity set", "cart": await get(user_id, db_session)}
 
 
 async def remove_product(user_id: int, product_id: int, db_session: AsyncSession):
@@ -161,33 +256,131 @@ async def remove_product(user_id: int, product_id: int, db_session: AsyncSession
     Returns:
         dict: A dictionary containing a success message and the updated cart instance.
     """
-    cart = await get(user_id, db_session)
-
-    try:
-        if cart.products[str(product_id)]["quantity"] == 1:
-            cart.products = {
-                k: v for k, v in cart.products.items() if k != str(product_id)
-            }
-        else:
-            product = await products_service.get(product_id, db_session)
-            cart.products = cart.products | {
-                str(product_id): {
-                    "quantity": cart.products[str(product.id)]["quantity"] - 1,
-                    "price": cart.products[str(product.id)]["price"] - product.price,
+    if cart_store is not None:
+        cart = await cart_store.remove_product(user_id, product_id, db_session)
+        return {"message": "Product removed", "cart": cart}
+
+    item = CartItem.user_id == user_id, CartItem.product_id == product_id
+
+    res = await db_session.execute(
+        update(CartItem)
+        .where(*item, CartItem.quantity > 1)
+        .values(quantity=CartItem.quantity - 1)
+        .returning(CartItem.quantity)
+    )
+    if res.first() is None:
+        res = await db_session.execute(
+            delete(CartItem).where(*item).returning(CartItem.product_id)
+        )
+        if res.first() is None:
+            await db_session.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail=f"There is no product with id {product_id} in user cart",
+            )
+
+    await db_session.commit()
+
+    return {"message": "Product removed", "cart": await get(user_id, db_session)}
+
+
+async def set_quantities(
+    user_id: int, items: List[CartItemQuantitySchema], db_session: AsyncSession
+):
+    """
+    Set the quantities of many products in the user's cart in a single transaction.
+    Products with a quantity less than 1 are removed. If a product is listed
+    more than once, the last quantity wins.
+
+    Args:
+        user_id (int): The ID of the user whose cart to update.
+        items (List[CartItemQuantitySchema]): The products and their desired quantities.
+        db_session (AsyncSession): The asynchronous database session.
+
+    Raises:
+        ObjectWithIdNotFound: If a product to set a quantity for does not exist.
+
+    Returns:
+        dict: A dictionary containing a success message and the updated cart instance.
+    """
+    quantities = {item.product_id: item.quantity for item in items}
+
+    if cart_store is not None:
+        cart = await cart_store.set_quantities(user_id, quantities, db_session)
+        return {"message": "Cart updated", "cart": cart}
+
+    removed = [id for id, quantity in quantities.items() if quantity < 1]
+    kept = {id: quantity for id, quantity in quantities.items() if quantity >= 1}
+
+    if kept:
+        res = await db_session.exec(
+            select(Product.id, Product.price).where(Product.id.in_(kept))
+        )
+        prices = dict(res.all())
+        for id in kept:
+            if id not in prices:
+                raise ObjectWithIdNotFound(id, Product)
+
+        stmt = insert(CartItem).values(
+            [
+                {
+                    "user_id": user_id,
+                    "product_id": id,
+                    "quantity": quantity,
+                    "unit_price": prices[id],
                 }
-            }
-    except KeyError:
-        raise HTTPException(
-            status_code=400,
-            detail=f"There is no product with id {product_id} in user cart",
+                for id, quantity in kept.items()
+            ]
+        )
+        await db_session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[CartItem.user_id, CartItem.product_id],
+                set_={
+                    "quantity": stmt.excluded.quantity,
+                    "unit_price": stmt.excluded.unit_price,
+                },
+            )
         )
 
-    cart.total_price = 0
-    for k, v in cart.products.items():
-        cart.total_price += v["price"]
+    if removed:
+        await db_session.execute(
+            delete(CartItem).where(
+                CartItem.user_id == user_id, CartItem.product_id.in_(removed)
+            )
+        )
 
-    db_session.add(cart)
     await db_session.commit()
-    await db_session.refresh(cart)
 
-    return {"message": "Product removed", "cart": cart}
+    return {"message": "Cart updated", "cart": await get(user_id, db_session)}
+
+
+async def reprice_product(product_id: int, price: float, db_session: AsyncSession):
+    """
+    Set the unit price of a product in every cart that holds it, with a single
+    UPDATE. Line prices and totals are derived from it when a cart is read.
+    Does not commit.
+
+    Args:
+        product_id (int): The ID of the repriced product.
+        price (float): The new price of the product.
+        db_session (AsyncSession): The asynchronous database session.
+
+    Returns:
+        dict: The number of carts touched and the time taken in milliseconds.
+    """
+    start = time.perf_counter()
+
+    res = await db_session.execute(
+        update(CartItem)
+        .where(CartItem.product_id == product_id, CartItem.unit_price != price)
+        .values(unit_price=price)
+        .returning(CartItem.user_id)
+    )
+    touched = set(res.scalars().all())
+    if cart_store is not None:
+        touched |= cart_store.reprice(product_id, price)
+
+    return {
+        "carts": len(touched),
+        "time_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
@@ -0,0 +1,367 @@
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from sqlmodel import select
+
+from sqlalchemy import Float, Integer, column, delete, text, values
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.dialects.postgresql import insert
+
+from fastapi import HTTPException
+
+from collections import OrderedDict
+
+from typing import Dict, Optional, Tuple, Union
+
+import asyncio
+import logging
+import time
+
+from config import settings
+
+from database.session import engine, session_maker
+
+from products import service as products_service
+from products.models import Product
+
+from users.models import User
+
+from .models import Cart, CartItem
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock held by the one process using the memory cart store.
+CART_STORE_LOCK = 0xCA27
+
+
+class MemoryCartStore:
+    """
+    Process-local write-behind cart store.
+
+    Carts are loaded from the database on first use and then read and
+    modified in memory; changed carts are written back in batches by
+    `flush`, which replaces each cart's rows with the cached cart. Any
+    shared store (e.g. Redis) has to provide the same methods.
+
+    Only one process may use it: carts cached by several processes would
+    overwrite each other's changes, and a cart could be turned into several
+    orders. `open` claims the store with an advisory lock held until
+    `close`, so a second worker fails to start.
+    """
+
+    def __init__(self, maxsize: int, batch_size: int):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+
+        self._carts: OrderedDict[int, Dict[int, CartItem]] = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        self._dirty: Dict[int, float] = {}
+        # The sessions and quantities of the carts taken by transactions
+        # that haven't ended yet.
+        self._taken: Dict[int, Tuple[AsyncSession, Dict[int, int]]] = {}
+
+        self._lock: Optional[AsyncConnection] = None
+
+        self.flushes = 0
+        self.flushed_carts = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.last_flush_lag = 0.0
+        self.max_flush_lag = 0.0
+        self.last_flush_time = 0.0
+
+    async def _items(self, user_id: int, db_session: AsyncSession):
+        items = self._carts.get(user_id)
+        if items is None:
+            res = await db_session.exec(
+                select(CartItem).where(CartItem.user_id == user_id)
+            )
+            loaded = {
+                item.product_id: CartItem.model_validate(item) for item in res.all()
+            }
+            items = self._carts.setdefault(user_id, loaded)
+            self._evict(keep=user_id)
+        self._carts.move_to_end(user_id)
+        return items
+
+    def _evict(self, keep: Optional[int] = None):
+        # Dirty carts are kept until flushed, and so is the cart being loaded,
+        # so the store may hold more than `maxsize` carts for a while.
+        for user_id in list(self._carts):
+            if len(self._carts) <= self.maxsize:
+                break
+            if user_id not in self._dirty and user_id != keep:
+                del self._carts[user_id]
+
+    def _changed(self, user_id: int):
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        self._dirty.setdefault(user_id, time.monotonic())
+
+    def _cart(self, user_id: int) -> Cart:
+        return Cart.from_items(
+            user_id, sorted(self._carts[user_id].values(), key=lambda i: i.product_id)
+        )
+
+    async def get(self, user_id: int, db_session: AsyncSession) -> Cart:
+        await self._items(user_id, db_session)
+        return self._cart(user_id)
+
+    async def add_product(
+        self, user_id: int, product_id: int, db_session: AsyncSession
+    ) -> Cart:
+        product = await products_service.get(product_id, db_session, cached=True)
+        items = await self._items(user_id, db_session)
+
+        item = items.get(product_id)
+        if item is not None and item.quantity > 9:
+            raise HTTPException(
+                status_code=400, detail="Max quantity for one product is 10"
+            )
+
+        items[product_id] = CartItem(
+            user_id=user_id,
+            product_id=product_id,
+            quantity=item.quantity + 1 if item else 1,
+            unit_price=product.price,
+        )
+        self._changed(user_id)
+        return self._cart(user_id)
+
+    async def set_quantities(
+        self, user_id: int, quantities: Dict[int, int], db_session: AsyncSession
+    ) -> Cart:
+        products = {
+            id: await products_service.get(id, db_session, cached=True)
+            for id, quantity in quantities.items()
+            if quantity >= 1
+        }
+        items = await self._items(user_id, db_session)
+
+        for id, quantity in quantities.items():
+            if quantity < 1:
+                items.pop(id, None)
+            else:
+                items[id] = CartItem(
+                    user_id=user_id,
+                    product_id=id,
+                    quantity=quantity,
+                    unit_price=products[id].price,
+                )
+        self._changed(user_id)
+        return self._cart(user_id)
+
+    async def remove_product(
+        self, user_id: int, product_id: int, db_session: AsyncSession
+    ) -> Cart:
+        items = await self._items(user_id, db_session)
+
+        item = items.get(product_id)
+        if item is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"There is no product with id {product_id} in user cart",
+            )
+
+        if item.quantity <= 1:
+            del items[product_id]
+        else:
+            item.quantity -= 1
+        self._changed(user_id)
+        return self._cart(user_id)
+
+    def reprice(self, product_id: int, price: float) -> set:
+        """
+        Set the unit price of a product in every cached cart that holds it.
+
+        Returns:
+            set: The IDs of the users whose carts were changed.
+        """
+        touched = set()
+        for user_id, items in self._carts.items():
+            item = items.get(product_id)
+            if item is not None and item.unit_price != price:
+                item.unit_price = price
+                touched.add(user_id)
+        for user_id in touched:
+            self._changed(user_id)
+        return touched
+
+    async def take(self, user_id: int, db_session: AsyncSession) -> Cart:
+        """
+        Return what a cart holds, e.g. when it is turned into an order.
+
+        The cart is left as it is until the caller's transaction ends: call
+        `commit_take` after it commits or `release_take` if it fails. Until
+        then, taking the same cart in another session returns an empty cart,
+        so a cart can only be turned into one order.
+        """
+        if user_id in self._taken:
+            return Cart.from_items(user_id, [])
+        items = await self._items(user_id, db_session)
+        self._taken[user_id] = (
+            db_session,
+            {id: item.quantity for id, item in items.items()},
+        )
+        return self._cart(user_id)
+
+    def commit_take(self, user_id: int, db_session: AsyncSession):
+        """
+        Remove the taken items from a cart once the transaction that deleted
+        its rows has committed. Products added in the meantime are kept.
+
+        The cart is marked dirty so a flush that started before the commit
+        can't resurrect the deleted rows.
+        """
+        if self._taken.get(user_id, (None,))[0] is not db_session:
+            return
+        _, taken = self._taken.pop(user_id)
+        items = self._carts.get(user_id)
+        if items is None:
+            return
+        for id, quantity in taken.items():
+            item = items.get(id)
+            if item is None:
+                continue
+            if item.quantity <= quantity:
+                del items[id]
+            else:
+                item.quantity -= quantity
+        self._changed(user_id)
+
+    def release_take(self, user_id: int, db_session: AsyncSession):
+        """
+        Give a taken cart back, e.g. when its order could not be created.
+        """
+        if self._taken.get(user_id, (None,))[0] is db_session:
+            del self._taken[user_id]
+
+    async def flush(self) -> int:
+        """
+        Write one batch of the longest-dirty carts back to the database.
+
+        Returns:
+            int: The number of carts written.
+        """
+        batch = list(self._dirty)[: self.batch_size]
+        if not batch:
+            return 0
+
+        start = time.monotonic()
+        lag = start - self._dirty[batch[0]]
+        versions = {user_id: self._versions[user_id] for user_id in batch}
+        rows = [
+            (item.user_id, item.product_id, item.quantity, item.unit_price)
+            for user_id in batch
+            for item in self._carts.get(user_id, {}).values()
+        ]
+
+        async with session_maker() as db_session:
+            await db_session.execute(
+                delete(CartItem).where(CartItem.user_id.in_(batch))
+            )
+            if rows:
+                # Skip items of products or users deleted since they were cached.
+                data = values(
+                    column("user_id", Integer),
+                    column("product_id", Integer),
+                    column("quantity", Integer),
+                    column("unit_price", Float),
+                    name="data",
+                ).data(rows)
+                await db_session.execute(
+                    insert(CartItem).from_select(
+                        ["user_id", "product_id", "quantity", "unit_price"],
+                        select(
+                            data.c.user_id,
+                            data.c.product_id,
+                            data.c.quantity,
+                            data.c.unit_price,
+                        )
+                        .join(Product, Product.id == data.c.product_id)
+                        .join(User, User.id == data.c.user_id),
+                    )
+                )
+            await db_session.commit()
+
+        for user_id, version in versions.items():
+            if self._versions.get(user_id) == version:
+                del self._dirty[user_id]
+        self._evict()
+
+        self.flushes += 1
+        self.flushed_carts += len(batch)
+        self.last_batch_size = len(batch)
+        self.max_batch_size = max(self.max_batch_size, len(batch))
+        self.last_flush_lag = lag
+        self.max_flush_lag = max(self.max_flush_lag, lag)
+        self.last_flush_time = time.monotonic() - start
+
+        return len(batch)
+
+    async def flush_all(self):
+        while self._dirty:
+            await self.flush()
+
+    async def open(self):
+        """
+        Claim the store for this process.
+
+        Raises:
+            RuntimeError: If another process is already using the memory cart store.
+        """
+        lock = await engine.connect()
+        res = await lock.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": CART_STORE_LOCK}
+        )
+        await lock.commit()
+        if not res.scalar():
+            await lock.close()
+            raise RuntimeError(
+                "CART_STORE=memory is in use by another process; "
+                "it only supports a single worker"
+            )
+        self._lock = lock
+
+    async def close(self):
+        """
+        Write back every dirty cart and give up the store.
+        """
+        try:
+            await self.flush_all()
+        finally:
+            if self._lock is not None:
+                await self._lock.close()
+                self._lock = None
+
+    async def run_flusher(self):
+        """
+        Flush dirty carts every `CART_FLUSH_INTERVAL` seconds until cancelled.
+        """
+        while True:
+            await asyncio.sleep(settings.CART_FLUSH_INTERVAL)
+            try:
+                while await self.flush() == self.batch_size:
+                    pass
+            except Exception:
+                logger.exception("Failed to flush carts")
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {
+            "size": len(self._carts),
+            "dirty": len(self._dirty),
+            "flushes": self.flushes,
+            "flushed_carts": self.flushed_carts,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_size,
+            "last_flush_lag_ms": round(self.last_flush_lag * 1000, 3),
+            "max_flush_lag_ms": round(self.max_flush_lag * 1000, 3),
+            "last_flush_time_ms": round(self.last_flush_time * 1000, 3),
+        }
+
+
+cart_store: Optional[MemoryCartStore] = (
+    MemoryCartStore(
+        maxsize=settings.CART_STORE_SIZE, batch_size=settings.CART_FLUSH_BATCH_SIZE
+    )
+    if settings.CART_STORE == "memory"
+    else None
+)
@@ -0,0 +1,78 @@
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from sqlalchemy import text
+
+from typing import Callable, Iterable, List
+
+import json
+import logging
+
+from config import settings
+
+from database import listen
+
+logger = logging.getLogger(__name__)
+
+# Catalog writes are sent on this channel with Postgres NOTIFY, so that every
+# worker drops its cached copies of the changed products and categories.
+CHANNEL = "catalog_changes"
+
+ChangeHandler = Callable[[List[int], List[int]], None]
+
+_handlers: List[ChangeHandler] = []
+
+
+def on_change(handler: ChangeHandler) -> ChangeHandler:
+    """
+    Register a function called with the IDs of the changed products and
+    categories of every notified catalog change. Usable as a decorator.
+    """
+    _handlers.append(handler)
+    return handler
+
+
+async def notify_change(
+    db_session: AsyncSession,
+    products: Iterable[int] = (),
+    categories: Iterable[int] = (),
+):
+    """
+    Queue a notification of changed products and categories, delivered to
+    every worker when the current transaction commits. Does nothing unless
+    `CATALOG_CHANGES_NOTIFY` is enabled. Does not commit.
+
+    The writing worker still invalidates its own caches after the commit, so
+    its next reads see the change without waiting for the notification.
+
+    Args:
+        db_session (AsyncSession): The session of the writing transaction.
+        products (Iterable[int]): The IDs of the changed products.
+        categories (Iterable[int]): The IDs of the changed categories.
+    """
+    if not settings.CATALOG_CHANGES_NOTIFY:
+        return
+    await db_session.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {
+            "channel": CHANNEL,
+            "payload": json.dumps(
+                {"products": list(products), "categories": list(categories)}
+            ),
+        },
+    )
+
+
+def _on_notification(connection, pid, channel, payload):
+    change = json.loads(payload)
+    for handler in _handlers:
+        try:
+            handler(change["products"], change["categories"])
+        except Exception:
+            logger.exception("Failed to apply a catalog change")
+
+
+async def listen_for_changes():
+    """
+    Apply the catalog changes notified by every worker until cancelled.
+    """
+    await listen(CHANNEL, _on_notification, settings.CATALOG_CHANGES_KEEPALIVE)
@@ -0,0 +1,97 @@
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from typing import Dict, List, Optional
+
+import time
+
+from cache import TTLCache
+
+from catalog import on_change
+
+from conditional import validators
+
+from config import settings
+
+from database import mark_catalog_write
+
+from .models import Category
+
+category_cache = TTLCache(
+    maxsize=settings.CATALOG_CACHE_SIZE, ttl=settings.CATALOG_CACHE_TTL
+)
+category_list_cache = TTLCache(
+    maxsize=settings.CATALOG_CACHE_SIZE, ttl=settings.CATALOG_CACHE_TTL
+)
+
+
+class SlugIndex:
+    """
+    In-memory map of every category slug to its id.
+
+    The whole map is loaded with one query and reloaded after the TTL, or
+    after a category is changed by another worker. The categories service
+    keeps it up to date with this worker's writes. A slug missing from the
+    map is not looked up in the database: unknown slugs fail fast.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+        self._ids: Dict[str, int] = {}
+        self._expires_at = 0.0
+
+    async def get(self, slug: str, db_session: AsyncSession) -> Optional[int]:
+        """
+        Look up the id of the category with the given slug.
+
+        Args:
+            slug (str): The slug of the category.
+            db_session (AsyncSession): The session used to reload an expired map.
+
+        Returns:
+            Optional[int]: The category id, or None if there is no such category.
+        """
+        if self._expires_at <= time.monotonic():
+            res = await db_session.exec(select(Category.slug, Category.id))
+            self._ids = dict(res.all())
+            self._expires_at = time.monotonic() + self.ttl
+
+        return self._ids.get(slug)
+
+    def add(self, slug: str, id: int):
+        self._ids[slug] = id
+
+    def remove(self, slug: str):
+        self._ids.pop(slug, None)
+
+    def expire(self):
+        """
+        Reload the whole map on the next lookup.
+        """
+        self._expires_at = 0.0
+
+
+slug_index = SlugIndex(ttl=settings.CATALOG_CACHE_TTL)
+
+
+def invalidate_category(id: int):
+    """
+    Drop a category, looked up by id or slug, and every cached category page.
+
+    Args:
+        id (int): The ID of the changed category.
+    """
+    category_cache.evict(lambda category: category.id == id)
+    category_list_cache.clear()
+    validators.invalidate("categories")
+    mark_catalog_write()
+
+
+@on_change
+def _apply_change(products: List[int], categories: List[int]):
+    for id in categories:
+        invalidate_category(id)
+    if categories:
+        # The notification doesn't carry slugs, so the whole map is reloaded.
+        slug_index.expire()
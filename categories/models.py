@@ -7,4 +7,4 @@ class Category(SQLModel, table=True):
     id: int = Field(primary_key=True)
 
     title: str = Field(nullable=False)
-    slug: str = Field(nullable=False)
+    slug: str = Field(nullable=False, unique=True)
@@ -3,14 +3,21 @@ from fastapi import APIRouter, Depends, Response
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from typing import Annotated, Dict, List, Union
+from typing import Annotated, Dict, Optional, Union
 
-from database import get_db_session
+from database import get_db_session, get_db_catalog_read_session
 
 from users import User
 
 from auth import admin
 
+from pagination import Limit, Page
+
+from conditional import Conditional, conditional_get
+
+from config import settings
+
+from .cache import category_cache, category_list_cache
 from .models import Category
 from .schemas import CreateCategorySchema, UpdateCategorySchema
 
@@ -19,6 +26,13 @@ from . import service
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
 
+CategoriesConditional = Annotated[
+    Conditional,
+    Depends(
+        conditional_get("categories", cache_control=settings.CATALOG_CACHE_CONTROL)
+    ),
+]
+
 
 @router.post("/", status_code=201, response_model=Dict[str, Union[str, Category]])
 async def create_category(
@@ -31,25 +45,38 @@ async def create_category(
 
 @router.get("/{id}", response_model=Category)
 async def get_category_by_id(
+    conditional: CategoriesConditional,
     id: int,
-    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    db_session: Annotated[AsyncSession, Depends(get_db_catalog_read_session)],
 ):
-    return await service.get(id, db_session)
+    return conditional.tag(await service.get(id, db_session, cached=True))
 
 
 @router.get("/slug/{slug}", response_model=Category)
 async def get_category_by_slug(
+    conditional: CategoriesConditional,
     slug: str,
-    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    db_session: Annotated[AsyncSession, Depends(get_db_catalog_read_session)],
 ):
-    return await service.get_with_slug(slug, db_session)
+    return conditional.tag(await service.get_with_slug(slug, db_session))
 
 
-@router.get("/all/", response_model=List[Category])
+@router.get("/all/", response_model=Page[Category])
 async def get_all_categories(
-    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    conditional: CategoriesConditional,
+    db_session: Annotated[AsyncSession, Depends(get_db_catalog_read_session)],
+    limit: Limit = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+):
+    return conditional.tag(await service.get_all(db_session, limit, after, sort))
+
+
+@router.get("/cache/", response_model=Dict[str, Dict[str, Union[int, float]]])
+async def get_category_cache_stats(
+    current_user: Annotated[User, Depends(admin)],
 ):
-    return await service.get_all(db_session)
+    return {"items": category_cache.stats(), "lists": category_list_cache.stats()}
 
 
 @router.patch("/{id}", response_model=Dict[str, Union[str, Category]])
@@ -1,6 +1,8 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 
+from typing import Optional
+
 from sqlalchemy.exc import IntegrityError
 
 from fastapi import HTTPException
@@ -9,6 +11,18 @@ from http_exceptions import ObjectWithIdNotFound
 
 from config import settings
 
+from pagination import Page, paginate
+
+from catalog import notify_change
+
+from products.cache import invalidate_category_products
+
+from .cache import (
+    category_cache,
+    category_list_cache,
+    invalidate_category,
+    slug_index,
+)
 from .models import Category
 from .schemas import CreateCategorySchema, UpdateCategorySchema
 
@@ -32,6 +46,8 @@ async def create(data: CreateCategorySchema, db_session: AsyncSession):
 
     try:
         db_session.add(category)
+        await db_session.flush()
+        await notify_change(db_session, categories=[category.id])
         await db_session.commit()
         await db_session.refresh(category)
     except IntegrityError:
@@ -39,16 +55,21 @@ async def create(data: CreateCategorySchema, db_session: AsyncSession):
             status_code=409, detail="Category with this slug already exist"
         )
 
+    invalidate_category(category.id)
+    slug_index.add(category.slug, category.id)
+
     return {"message": "Category created", "category": category}
 
 
-async def get(id: int, db_session: AsyncSession):
+async def get(id: int, db_session: AsyncSession, cached: bool = False):
     """
     Retrieve a category by its unique ID.
 
     Args:
         id (int): The ID of the category to retrieve.
         db_session (AsyncSession): The asynchronous database session.
+        cached (bool): Serve a detached copy from the catalog cache when possible.
+            Don't use it for categories that are going to be modified.
 
     Raises:
         ObjectWithIdNotFound: If no category with the given ID exists.
@@ -56,16 +77,25 @@ async def get(id: int, db_session: AsyncSession):
     Returns:
         Category: The category instance with the specified ID.
     """
+    if cached:
+        category = category_cache.get(("id", id))
+        if category is not None:
+            return category
+
     res = await db_session.exec(select(Category).where(Category.id == id))
     category = res.first()
     if category is None:
         raise ObjectWithIdNotFound(id, Category)
+
+    if cached:
+        category = Category.model_validate(category)
+        category_cache.set(("id", id), category)
     return category
 
 
 async def get_with_slug(slug: str, db_session: AsyncSession):
     """
-    Retrieve a category by its slug.
+    Retrieve a category by its slug, served from the catalog cache when possible.
 
     Args:
         slug (str): The slug identifier of the category.
@@ -78,29 +108,54 @@ async def get_with_slug(slug: str, db_session: AsyncSession):
     Returns:
         Category: The category instance with the specified slug.
     """
+    category = category_cache.get(("slug", slug))
+    if category is not None:
+        return category
+
+    if await slug_index.get(slug, db_session) is None:
+        raise HTTPException(
+            status_code=404, detail=f"Category with slug '{slug}' not found"
+        )
+
     res = await db_session.exec(select(Category).where(Category.slug == slug))
     category = res.first()
     if category is None:
         raise HTTPException(
             status_code=404, detail=f"Category with slug '{slug}' not found"
         )
+
+    category = Category.model_validate(category)
+    category_cache.set(("slug", slug), category)
     return category
 
 
-async def get_all(db_session: AsyncSession):
+async def get_all(
+    db_session: AsyncSession,
+    limit: int = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+) -> Page[Category]:
     """
-    Retrieve all categories from the database.
+    Retrieve a page of categories, served from the catalog cache when possible.
 
     Args:
         db_session (AsyncSession): The asynchronous database session.
+        limit (int): The maximum number of categories to return.
+        after (Optional[str]): The cursor of the previous page.
+        sort (str): The field to sort by ("id" or "title"), "-" prefix for descending.
 
     Returns:
-        List[Category]: A list of all category instances.
+        Page[Category]: A page of category instances.
     """
-    res = await db_session.exec(select(Category))
-    categories = res.all()
-
-    return categories
+    key = (limit, after, sort)
+    page = category_list_cache.get(key)
+    if page is None:
+        page = await paginate(
+            db_session, select(Category), Category, limit, after, sort, ("id", "title")
+        )
+        page.items = [Category.model_validate(c) for c in page.items]
+        category_list_cache.set(key, page)
+    return page
 
 
 async def update(
@@ -120,15 +175,22 @@ async def update(
         dict: A dictionary containing a success message and the updated category instance.
     """
     category = await get(id, db_session)
+    slug = category.slug
 
     for k, v in data.model_dump().items():
         if v is not None:
             setattr(category, k, v)
 
     db_session.add(category)
+    await notify_change(db_session, categories=[id])
     await db_session.commit()
     await db_session.refresh(category)
 
+    invalidate_category(id)
+    invalidate_category_products(id)
+    slug_index.remove(slug)
+    slug_index.add(category.slug, id)
+
     return {"message": "Category updated", "category": category}
 
 
@@ -151,5 +213,12 @@ async def delete(
     """
     category = await get(id, db_session)
 
+    slug = category.slug
+
     await db_session.delete(category)
+    await notify_change(db_session, categories=[id])
     await db_session.commit()
+
+    invalidate_category(id)
+    invalidate_category_products(id)
+    slug_index.remove(slug)
@@ -0,0 +1,184 @@
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from email.utils import format_datetime, parsedate_to_datetime
+
+from datetime import datetime, timezone
+
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple, Union
+
+import hashlib
+import json
+import time
+
+from cache import TTLCache
+
+from config import settings
+
+
+class Validators:
+    """
+    In-process store of the ETag and Last-Modified time of GET responses.
+
+    The ETag is a hash of the response body, so every worker derives the
+    same ETag for the same data. Each response depends on one or more
+    scopes, e.g. "products" or one user's orders; writers invalidate the
+    scopes they change, next to the cached data the responses are built
+    from, so stored validators never outlive the data they describe.
+    """
+
+    def __init__(self, maxsize: int):
+        self._validators = TTLCache(maxsize=maxsize, ttl=0)
+        # When each scope was last invalidated, to avoid storing validators
+        # of responses built from data read before the invalidation.
+        self._invalidated = TTLCache(maxsize=maxsize, ttl=60)
+
+    def get(self, key: Hashable) -> Optional[Tuple[str, float]]:
+        item = self._validators.get(key)
+        return None if item is None else item[1:]
+
+    def set(
+        self,
+        key: Hashable,
+        scopes: Sequence[Hashable],
+        etag: str,
+        last_modified: float,
+        ttl: float,
+        since: float,
+    ):
+        if any(self._invalidated.get(scope, 0.0) >= since for scope in scopes):
+            return
+        self._validators.set(key, (tuple(scopes), etag, last_modified), ttl=ttl)
+
+    def invalidate(self, scope: Hashable):
+        """
+        Drop the validators of every response that depends on a scope.
+        """
+        self._invalidated.set(scope, time.monotonic())
+        self._validators.evict(lambda item: scope in item[0])
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return self._validators.stats()
+
+
+validators = Validators(maxsize=settings.ETAG_CACHE_SIZE)
+
+
+def _headers(etag: str, last_modified: float, cache_control: str) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Last-Modified": format_datetime(
+            datetime.fromtimestamp(int(last_modified), timezone.utc), usegmt=True
+        ),
+        "Cache-Control": cache_control,
+    }
+
+
+def _matches(request: Request, etag: str, last_modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(last_modified) <= since
+
+
+class Conditional:
+    """
+    Conditional GET handling for one request.
+
+    `check` answers the request with 304 from the stored validators, before
+    the route queries or serializes anything. `tag` sets the validators of
+    the response the route built and stores them for the next requests.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        response: Response,
+        scopes: Sequence[Hashable],
+        cache_control: str,
+        ttl: float,
+    ):
+        self.request = request
+        self.response = response
+        self.scopes = tuple(scopes)
+        self.cache_control = cache_control
+        self.ttl = ttl
+
+        self._key = (self.scopes, request.url.path, request.url.query)
+        self._started_at = time.monotonic()
+
+    def check(self):
+        """
+        Raises:
+            HTTPException:
+                - 304 if the client's copy matches If-None-Match or If-Modified-Since.
+        """
+        self.response.headers["Cache-Control"] = self.cache_control
+        stored = validators.get(self._key)
+        if stored is not None and _matches(self.request, *stored):
+            raise HTTPException(
+                status_code=304, headers=_headers(*stored, self.cache_control)
+            )
+
+    def tag(self, data: Any) -> Any:
+        """
+        Set the ETag and Last-Modified headers of the route's response.
+
+        Args:
+            data (Any): The data the route returns.
+
+        Raises:
+            HTTPException:
+                - 304 if the client's copy matches If-None-Match or If-Modified-Since.
+
+        Returns:
+            Any: `data`, unchanged.
+        """
+        body = json.dumps(
+            jsonable_encoder(data), sort_keys=True, separators=(",", ":")
+        ).encode()
+        etag = f'W/"{hashlib.sha1(body).hexdigest()[:16]}"'
+
+        # Keep the Last-Modified time while the data doesn't change.
+        stored = validators.get(self._key)
+        last_modified = (
+            stored[1] if stored is not None and stored[0] == etag else time.time()
+        )
+        validators.set(
+            self._key, self.scopes, etag, last_modified, self.ttl, self._started_at
+        )
+
+        headers = _headers(etag, last_modified, self.cache_control)
+        if _matches(self.request, etag, last_modified):
+            raise HTTPException(status_code=304, headers=headers)
+        self.response.headers.update(headers)
+        return data
+
+
+def conditional_get(
+    *scopes: Hashable, cache_control: str, ttl: float = settings.CATALOG_CACHE_TTL
+):
+    """
+    Build a route dependency that answers conditional GETs of responses
+    depending on the given scopes.
+
+    Declare it before the route's other dependencies, so that a 304 is
+    returned before a database session is opened, and pass the route's
+    result through the `Conditional.tag` of the returned object.
+    """
+
+    async def dependency(request: Request, response: Response) -> Conditional:
+        conditional = Conditional(request, response, scopes, cache_control, ttl)
+        conditional.check()
+        return conditional
+
+    return dependency
@@ -1,14 +1,99 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from typing import Literal
+
 
 class Settings(BaseSettings):
     POSTGRES_URL: str
+    POSTGRES_REPLICA_URL: str | None = None
+    POSTGRES_REPLICA_MAX_LAG: float = 5.0
+
+    POSTGRES_POOL_SIZE: int = 5
+    POSTGRES_MAX_OVERFLOW: int = 10
+    POSTGRES_POOL_TIMEOUT: float = 30.0
+    POSTGRES_POOL_RECYCLE: int = -1
+    POSTGRES_POOL_PRE_PING: bool = False
+    POSTGRES_STATEMENT_CACHE_SIZE: int = 100
+    POSTGRES_POOL_STATS_LOG_INTERVAL: int = 60
 
     ACCESS_TOKEN_SIGNATURE_SECRET: str
     ACCESS_TOKEN_EXPIRATION_TIME: int
+    # Stateless tokens are authorized from their claims and the user's token
+    # version, cached per user for ACCESS_TOKEN_VERSION_CACHE_TTL seconds:
+    # changing a password or role revokes them within that window on every
+    # worker.
+    ACCESS_TOKEN_STATELESS: bool = False
+    ACCESS_TOKEN_VERSION_CACHE_TTL: float = 5.0
+    ACCESS_TOKEN_CACHE_SIZE: int = 10000
+
+    PASSWORD_HASHING_MAX_CONCURRENCY: int = 4
+    PASSWORD_HASHING_QUEUE_TIMEOUT: float = 5.0
 
     ADMIN_SECRET: str
 
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: float = 30.0
+
+    CATALOG_CACHE_SIZE: int = 1000
+    # Catalog writes of other workers are only seen by this worker's caches
+    # with CATALOG_CHANGES_NOTIFY; otherwise after this many seconds.
+    CATALOG_CACHE_TTL: float = 300.0
+    CATALOG_CHANGES_NOTIFY: bool = False
+    CATALOG_CHANGES_KEEPALIVE: float = 15.0
+
+    CATALOG_CACHE_CONTROL: str = "public, max-age=0, must-revalidate"
+    ORDERS_CACHE_CONTROL: str = "private, no-cache"
+    ETAG_CACHE_SIZE: int = 10000
+    # Order writes of other workers only invalidate this worker's ETags with
+    # ORDER_EVENTS_NOTIFY; otherwise they are noticed after this many seconds.
+    ORDERS_ETAG_TTL: float = 10.0
+
+    # The memory cart store only supports a single worker process: a second
+    # one fails to start.
+    CART_STORE: Literal["database", "memory"] = "database"
+    CART_STORE_SIZE: int = 100000
+    CART_FLUSH_INTERVAL: float = 1.0
+    CART_FLUSH_BATCH_SIZE: int = 500
+
+    ORDER_INTAKE: Literal["direct", "batched"] = "direct"
+    ORDER_INTAKE_BATCH_SIZE: int = 100
+    ORDER_INTAKE_MAX_WAIT: float = 0.005
+    ORDER_INTAKE_QUEUE_SIZE: int = 1000
+
+    ORDER_EVENTS_QUEUE_SIZE: int = 100
+    ORDER_EVENTS_NOTIFY: bool = False
+    ORDER_EVENTS_KEEPALIVE: float = 15.0
+
+    KITCHEN_BOARD_REFRESH_INTERVAL: float = 0.0
+
+    RESERVATION_SLOT_MINUTES: int = 30
+    RESERVATION_DURATION_MINUTES: int = 120
+    RESERVATION_OPENING_HOUR: int = 10
+    RESERVATION_CLOSING_HOUR: int = 22
+    RESERVATION_AVAILABILITY_DAYS: int = 400
+    RESERVATION_AVAILABILITY_TTL: float = 60.0
+
+    IDEMPOTENCY_KEY_TTL: int = 86400
+    IDEMPOTENCY_KEY_CLEANUP_INTERVAL: int = 3600
+
+    ORDERS_EXPORT_CHUNK_SIZE: int = 1000
+    ORDERS_PARTITION_MONTHS_AHEAD: int = 3
+    ORDERS_PARTITION_CHECK_INTERVAL: int = 3600
+    ORDERS_ARCHIVE_AFTER_MONTHS: int = 12
+    # Opt-in: when positive, listings of a user's orders without
+    # `created_from` only cover the current month and the previous ones up to
+    # this many months, so they only scan recent partitions. Clients pass
+    # `created_from` to list older orders. 0 lists all orders.
+    ORDERS_LIST_DEFAULT_MONTHS: int = 0
+
+    ANALYTICS_BACKFILL_CHUNK_SIZE: int = 10000
+    ANALYTICS_COMPACTION_INTERVAL: int = 10
+
+    PAGINATION_DEFAULT_LIMIT: int = 50
+    PAGINATION_MAX_LIMIT: int = 200
+
+    LOG_LEVEL: str = "INFO"
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
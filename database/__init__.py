@@ -1 +1,12 @@
 from .session import get_db_session as get_db_session
+from .session import get_db_read_session as get_db_read_session
+from .session import get_db_user_read_session as get_db_user_read_session
+from .session import get_db_catalog_read_session as get_db_catalog_read_session
+from .session import read_session as read_session
+from .session import mark_user_write as mark_user_write
+from .session import has_recent_write as has_recent_write
+from .session import mark_catalog_write as mark_catalog_write
+from .session import listen as listen
+from .session import engine as engine
+from .session import read_engine as read_engine
+from .session import log_pool_stats as log_pool_stats
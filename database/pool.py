@@ -0,0 +1,53 @@
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from typing import Dict, Union
+
+import time
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Async queue pool that records how long callers wait to acquire a connection.
+
+    The wait covers both blocking on a busy pool and opening a new connection,
+    which is exactly what a request pays before its first query runs.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquisitions = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+            self.acquisitions += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Report the current pool usage and acquisition wait times.
+
+        Returns:
+            dict: Pool size, checked out, idle and overflow connection counts
+            along with the number of acquisitions and wait times in milliseconds.
+        """
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "acquisitions": self.acquisitions,
+            "avg_wait_ms": (
+                round(self.total_wait / self.acquisitions * 1000, 3)
+                if self.acquisitions
+                else 0.0
+            ),
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+
+from typing import Annotated, Dict, Union
+
+from auth import admin
+
+from users import User
+
+from .session import get_pool_stats
+
+
+router = APIRouter(prefix="/database", tags=["Database"])
+
+
+@router.get("/pool", response_model=Dict[str, Dict[str, Union[int, float]]])
+async def get_connection_pool_stats(
+    current_user: Annotated[User, Depends(admin)],
+):
+    return get_pool_stats()
@@ -1,16 +1,69 @@
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-from typing import AsyncGenerator
+from fastapi import Depends
+
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, AsyncGenerator, AsyncIterator, Callable, Dict, Union
+
+import asyncio
+import logging
+import time
 
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from config import settings
 
-engine = create_async_engine(settings.POSTGRES_URL)
+from .pool import InstrumentedQueuePool
+
+logger = logging.getLogger(__name__)
+
+
+def create_engine(url: str) -> AsyncEngine:
+    """
+    Create an async engine with the pool configured from the settings.
+
+    Args:
+        url (str): The database URL.
+
+    Returns:
+        AsyncEngine: The configured engine.
+    """
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.POSTGRES_POOL_SIZE,
+        max_overflow=settings.POSTGRES_MAX_OVERFLOW,
+        pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+        pool_recycle=settings.POSTGRES_POOL_RECYCLE,
+        pool_pre_ping=settings.POSTGRES_POOL_PRE_PING,
+        connect_args={
+            "statement_cache_size": settings.POSTGRES_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.POSTGRES_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+engine = create_engine(settings.POSTGRES_URL)
 
 session_maker = sessionmaker(bind=engine, class_=AsyncSession)
 
+read_engine = (
+    create_engine(settings.POSTGRES_REPLICA_URL)
+    if settings.POSTGRES_REPLICA_URL
+    else engine
+)
+
+read_session_maker = sessionmaker(bind=read_engine, class_=AsyncSession)
+
+# When each user last wrote data through this process. Other workers don't
+# know about these writes, so a read served by another worker within the
+# replica lag may still miss them.
+_last_writes: Dict[int, float] = {}
+# When this process last learned of a catalog write.
+_last_catalog_write = float("-inf")
+
 
 async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
     async with session_maker() as session:
@@ -18,3 +71,197 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
             yield session
         finally:
             await session.close()
+
+
+async def _open_read_session() -> AsyncSession:
+    if read_engine is engine:
+        return session_maker()
+
+    session = read_session_maker()
+    try:
+        await session.connection()
+    except (DBAPIError, OSError):
+        logger.warning("Read replica is unavailable, falling back to primary")
+        await session.close()
+        return session_maker()
+    return session
+
+
+@asynccontextmanager
+async def read_session(primary: bool = False) -> AsyncIterator[AsyncSession]:
+    """
+    Open a session for read-only queries.
+
+    The session is bound to the read replica when one is configured and
+    reachable, otherwise to the primary.
+
+    Args:
+        primary (bool): Force the primary, e.g. to read the caller's own writes.
+
+    Yields:
+        AsyncSession: The asynchronous database session.
+    """
+    session = session_maker() if primary else await _open_read_session()
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+async def get_db_read_session() -> AsyncGenerator[AsyncSession, None]:
+    async with read_session() as session:
+        yield session
+
+
+async def get_db_catalog_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Open a read session for the catalog, bound to the primary for
+    `POSTGRES_REPLICA_MAX_LAG` seconds after a catalog write, so that the
+    catalog caches aren't refilled from a replica that hasn't applied it.
+    """
+    primary = (
+        time.monotonic() - _last_catalog_write <= settings.POSTGRES_REPLICA_MAX_LAG
+    )
+    async with read_session(primary=primary) as session:
+        yield session
+
+
+def get_db_user_read_session(get_user_id: Callable[..., Any]):
+    """
+    Build a dependency opening a read session for a user's data.
+
+    The session is bound to the primary while the user may have writes the
+    replica hasn't applied yet (see `has_recent_write`), and otherwise
+    behaves like `get_db_read_session`. Only writes made through the same
+    process are known.
+
+    Args:
+        get_user_id (Callable): A dependency returning the ID of the user whose data is read.
+    """
+
+    async def dependency(
+        user_id: Annotated[int, Depends(get_user_id)],
+    ) -> AsyncGenerator[AsyncSession, None]:
+        async with read_session(primary=has_recent_write(user_id)) as session:
+            yield session
+
+    return dependency
+
+
+def mark_user_write(user_id: int):
+    """
+    Remember that a user has just written data, so their next reads go to the primary.
+
+    Args:
+        user_id (int): The ID of the user who performed the write.
+    """
+    if read_engine is engine:
+        return
+
+    now = time.monotonic()
+    _last_writes[user_id] = now
+
+    for k in [
+        k
+        for k, v in _last_writes.items()
+        if now - v > settings.POSTGRES_REPLICA_MAX_LAG
+    ]:
+        del _last_writes[k]
+
+
+def has_recent_write(user_id: int) -> bool:
+    """
+    Check whether a user wrote data within the replica lag window.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        bool: True if the replica might not have the user's latest writes yet.
+    """
+    last_write = _last_writes.get(user_id)
+    if last_write is None:
+        return False
+    return time.monotonic() - last_write <= settings.POSTGRES_REPLICA_MAX_LAG
+
+
+def mark_catalog_write():
+    """
+    Remember that the catalog has just been written, by this process or
+    another one, so the next catalog reads go to the primary.
+    """
+    global _last_catalog_write
+    _last_catalog_write = time.monotonic()
+
+
+async def listen(
+    channel: str,
+    callback: Callable[[Any, int, str, str], None],
+    keepalive: float,
+):
+    """
+    Call `callback` with the notifications received on a Postgres channel
+    until cancelled, reconnecting when the connection is lost.
+
+    Args:
+        channel (str): The channel to LISTEN on.
+        callback (Callable): Called with the connection, the notifying backend's
+            PID, the channel and the payload of each notification.
+        keepalive (float): Seconds between queries checking the connection.
+    """
+    while True:
+        try:
+            async with engine.connect() as conn:
+                raw = await conn.get_raw_connection()
+                driver = raw.driver_connection
+                await driver.add_listener(channel, callback)
+                try:
+                    while not driver.is_closed():
+                        await asyncio.sleep(keepalive)
+                        await driver.execute("SELECT 1")
+                finally:
+                    if not driver.is_closed():
+                        await driver.remove_listener(channel, callback)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(
+                "Lost the connection listening on %s, reconnecting", channel
+            )
+        await asyncio.sleep(1)
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Union[int, float]]]:
+    """
+    Collect connection pool statistics for every engine.
+
+    Returns:
+        dict: Pool statistics keyed by engine name.
+    """
+    stats = {"primary": engine.pool.stats()}
+    if read_engine is not engine:
+        stats["replica"] = read_engine.pool.stats()
+    return stats
+
+
+async def log_pool_stats():
+    """
+    Periodically log connection pool statistics.
+
+    The interval is taken from `POSTGRES_POOL_STATS_LOG_INTERVAL`;
+    a non-positive value disables logging.
+    """
+    if settings.POSTGRES_POOL_STATS_LOG_INTERVAL <= 0:
+        return
+    while True:
+        await asyncio.sleep(settings.POSTGRES_POOL_STATS_LOG_INTERVAL)
+        for name, stats in get_pool_stats().items():
+            logger.info(
+                "%s pool: checked_out=%d idle=%d overflow=%d avg_wait_ms=%.3f max_wait_ms=%.3f",
+                name,
+                stats["checked_out"],
+                stats["idle"],
+                stats["overflow"],
+                stats["avg_wait_ms"],
+                stats["max_wait_ms"],
+            )
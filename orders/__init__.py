@@ -1,3 +1,4 @@
 from .routes import router as router
 
 from .models import Order as Order
+from .models import IdempotencyKey as IdempotencyKey
@@ -0,0 +1,157 @@
+from sqlmodel import select
+
+from typing import Dict, List, Optional, Tuple
+
+from datetime import datetime
+
+import asyncio
+import bisect
+import logging
+
+from config import settings
+
+from database import read_session
+
+from .models import Order
+from .schemas import Board, BoardOrder, BoardProduct
+
+logger = logging.getLogger(__name__)
+
+
+class KitchenBoard:
+    """
+    In-memory aggregate of the orders that are "in progress".
+
+    Keeps the in-progress orders ordered by age and the outstanding quantity
+    of each product, so reading the totals costs O(number of products).
+    Orders are kept in a dict, and their `(created_at, id)` keys in a sorted
+    list, so an order that goes back to "in progress" is put in place with
+    a binary search instead of re-sorting the board.
+    `orders.service` adds and removes orders as they are created and change
+    status. Each worker keeps its own board: with several workers, set
+    `KITCHEN_BOARD_REFRESH_INTERVAL` so boards pick up each other's changes.
+    """
+
+    def __init__(self):
+        self._orders: Dict[int, BoardOrder] = {}
+        self._keys: List[Tuple[datetime, int]] = []
+        self._quantities: Dict[int, int] = {}
+        self._pending: Optional[list] = None
+        self.ready = False
+
+    def _add(self, order: BoardOrder):
+        if order.id in self._orders:
+            return
+        self._orders[order.id] = order
+        bisect.insort(self._keys, (order.created_at, order.id))
+        for product_id, quantity in order.products.items():
+            self._quantities[product_id] = (
+                self._quantities.get(product_id, 0) + quantity
+            )
+
+    def _remove(self, order_id: int):
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return
+        del self._keys[bisect.bisect_left(self._keys, (order.created_at, order.id))]
+        for product_id, quantity in order.products.items():
+            self._quantities[product_id] -= quantity
+            if not self._quantities[product_id]:
+                del self._quantities[product_id]
+
+    def update(self, order: Order):
+        """
+        Add an order to the board or remove it, depending on its status.
+
+        Args:
+            order (Order): A committed order that was created or changed status.
+        """
+        if order.status == "in progress":
+            op, arg = self._add, BoardOrder(
+                id=order.id,
+                user_id=order.user_id,
+                created_at=order.created_at,
+                products={
+                    int(id): item["quantity"] for id, item in order.products.items()
+                },
+            )
+        else:
+            op, arg = self._remove, order.id
+        op(arg)
+        if self._pending is not None:
+            self._pending.append((op, arg))
+
+    async def rebuild(self):
+        """
+        Replace the board with the in-progress orders read from the database.
+
+        Updates made while the orders are being read are replayed on the new
+        board; adding and removing orders are idempotent, so updates already
+        reflected in the query result are harmless.
+        """
+        self._pending = []
+        try:
+            async with read_session(primary=True) as db_session:
+                res = await db_session.exec(
+                    select(Order.id, Order.user_id, Order.created_at, Order.products)
+                    .where(Order.status == "in progress")
+                    .order_by(Order.created_at, Order.id)
+                )
+                rows = res.all()
+
+            current = self._orders, self._keys, self._quantities
+            self._orders, self._keys, self._quantities = {}, [], {}
+            try:
+                for id, user_id, created_at, products in rows:
+                    self._add(
+                        BoardOrder(
+                            id=id,
+                            user_id=user_id,
+                            created_at=created_at,
+                            products={
+                                int(p): item["quantity"] for p, item in products.items()
+                            },
+                        )
+                    )
+                for op, arg in self._pending:
+                    op(arg)
+            except Exception:
+                self._orders, self._keys, self._quantities = current
+                raise
+        finally:
+            self._pending = None
+        self.ready = True
+
+    async def run(self):
+        """
+        Build the board at startup, retrying until it succeeds, then rebuild
+        it every `KITCHEN_BOARD_REFRESH_INTERVAL` seconds if that is positive.
+        """
+        while True:
+            try:
+                await self.rebuild()
+            except Exception:
+                logger.exception("Failed to build the kitchen board")
+                await asyncio.sleep(5)
+                continue
+            if settings.KITCHEN_BOARD_REFRESH_INTERVAL <= 0:
+                return
+            await asyncio.sleep(settings.KITCHEN_BOARD_REFRESH_INTERVAL)
+
+    def snapshot(self, limit: int) -> Board:
+        """
+        Return the outstanding quantity of each product and the `limit`
+        oldest in-progress orders.
+        """
+        orders = [self._orders[id] for _, id in self._keys[:limit]]
+        return Board(
+            products=[
+                BoardProduct(product_id=id, quantity=quantity)
+                for id, quantity in sorted(self._quantities.items())
+            ],
+            orders_count=len(self._orders),
+            orders=orders,
+        )
+
+
+kitchen_board = KitchenBoard()
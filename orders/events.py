@@ -0,0 +1,151 @@
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from sqlalchemy import text
+
+from contextlib import asynccontextmanager
+
+from typing import AsyncIterator, Dict, Iterable, List, Literal, Optional, Set, Union
+
+import asyncio
+import json
+
+from conditional import validators
+
+from config import settings
+
+from database import listen
+
+from .models import Order
+
+CHANNEL = "order_events"
+
+EventType = Literal["created", "updated"]
+
+
+class OrderEventHub:
+    """
+    In-process fan-out of order events to subscribers.
+
+    Each subscriber gets a bounded queue for one user's orders, or for all
+    orders (`user_id=None`). A subscriber whose queue fills up is
+    disconnected rather than letting the queue grow; clients are expected to
+    reconnect and re-read the orders they display.
+
+    Events are prepared inside the order's transaction and published after
+    it commits. With `notify` enabled they are sent with Postgres NOTIFY
+    instead, which delivers them on commit to the `listen` task of every
+    worker, this one included.
+    """
+
+    def __init__(self, queue_size: int, notify: bool = False):
+        self.queue_size = queue_size
+        self.notify = notify
+
+        self._subscribers: Dict[Optional[int], Set[asyncio.Queue]] = {}
+
+        self.published = 0
+        self.disconnected = 0
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: Optional[int]) -> AsyncIterator[asyncio.Queue]:
+        """
+        Subscribe to the events of a user's orders, or of all orders.
+
+        Yields:
+            asyncio.Queue: The subscriber's queue. A None item means the
+                subscriber has been disconnected.
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(user_id)
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def _fan_out(self, event: dict):
+        self.published += 1
+        for key in (event["user_id"], None):
+            for queue in self._subscribers.get(key, ()):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    self.disconnected += 1
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+
+    async def prepare(
+        self, orders: Iterable[Order], type: EventType, db_session: AsyncSession
+    ) -> List[dict]:
+        """
+        Build the events for orders written in the current transaction and,
+        in NOTIFY mode, queue them for delivery on commit.
+
+        Args:
+            orders (Iterable[Order]): The created or updated orders, flushed.
+            type (EventType): "created" or "updated".
+            db_session (AsyncSession): The session of the order's transaction.
+
+        Returns:
+            List[dict]: The events, to be passed to `publish` after the commit.
+        """
+        events = [
+            {
+                "type": type,
+                "id": order.id,
+                "user_id": order.user_id,
+                "status": order.status,
+                "total_price": order.total_price,
+                "created_at": order.created_at.isoformat(),
+            }
+            for order in orders
+        ]
+        if self.notify and events:
+            await db_session.execute(
+                text(
+                    "SELECT pg_notify(:channel, payload) "
+                    "FROM unnest(CAST(:payloads AS text[])) AS payload"
+                ),
+                {"channel": CHANNEL, "payloads": [json.dumps(e) for e in events]},
+            )
+        return events
+
+    def publish(self, events: List[dict]):
+        """
+        Deliver events to this worker's subscribers once their transaction
+        has committed. Does nothing in NOTIFY mode, where `listen` does it.
+        """
+        if self.notify:
+            return
+        for event in events:
+            self._fan_out(event)
+
+    def _on_notification(self, connection, pid, channel, payload):
+        event = json.loads(payload)
+        # The order may have been written by another worker.
+        validators.invalidate(("orders", event["user_id"]))
+        self._fan_out(event)
+
+    async def listen(self):
+        """
+        Deliver events received with Postgres LISTEN until cancelled,
+        reconnecting when the connection is lost.
+        """
+        await listen(CHANNEL, self._on_notification, settings.ORDER_EVENTS_KEEPALIVE)
+
+    def stats(self) -> Dict[str, Union[int, bool]]:
+        return {
+            "notify": self.notify,
+            "subscribers": sum(len(q) for q in self._subscribers.values()),
+            "published": self.published,
+            "disconnected": self.disconnected,
+        }
+
+
+order_events = OrderEventHub(
+    queue_size=settings.ORDER_EVENTS_QUEUE_SIZE,
+    notify=settings.ORDER_EVENTS_NOTIFY,
+)
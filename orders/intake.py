@@ -0,0 +1,177 @@
+from fastapi import HTTPException
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+Request = Tuple[int, Optional[str]]
+Handler = Callable[[List[Request]], Awaitable[List[Union[Any, Exception]]]]
+
+
+class OrderIntake:
+    """
+    Group-commit batcher for order creation.
+
+    Callers enqueue `(user_id, idempotency_key)` requests with `submit` and
+    wait for their own result. A single worker collects up to `batch_size`
+    requests, waiting at most `max_wait` seconds after the first one, and
+    hands them to `handler`, which processes the whole batch in one
+    transaction and returns one result or exception per request. If the
+    handler fails, the requests of the batch are retried one at a time, so
+    one bad request only fails itself.
+    """
+
+    def __init__(
+        self, handler: Handler, batch_size: int, max_wait: float, queue_size: int
+    ):
+        self.handler = handler
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.queue_size = queue_size
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._closed = False
+
+        self.batches = 0
+        self.orders = 0
+        self.rejected = 0
+        self.failed_batches = 0
+        self.failed_orders = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.max_queue_depth = 0
+        self.last_batch_time = 0.0
+        self.max_batch_time = 0.0
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        # Created lazily so it belongs to the running event loop.
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        return self._queue
+
+    async def submit(self, user_id: int, idempotency_key: Optional[str] = None):
+        """
+        Enqueue an order request and wait for its result.
+
+        Raises:
+            HTTPException:
+                - 503 if the queue is full or the intake is shutting down.
+
+        Returns:
+            Any: The handler's result for this request.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            if self._closed:
+                raise asyncio.QueueFull
+            self.queue.put_nowait((user_id, idempotency_key, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many orders are being placed, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return await future
+
+    async def _next_batch(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _process_one(self, request: Request) -> Union[Any, Exception]:
+        try:
+            return (await self.handler([request]))[0]
+        except Exception as e:
+            logger.exception("Failed to create an order")
+            self.failed_orders += 1
+            return e
+
+    async def _process(self, batch: list):
+        start = time.monotonic()
+        requests = [(u, k) for u, k, _ in batch]
+        if len(requests) == 1:
+            results = [await self._process_one(requests[0])]
+        else:
+            try:
+                results = await self.handler(requests)
+            except Exception:
+                logger.exception(
+                    "Failed to create a batch of %d orders, retrying them one by one",
+                    len(batch),
+                )
+                self.failed_batches += 1
+                results = [await self._process_one(request) for request in requests]
+
+        for (_, _, future), result in zip(batch, results):
+            self.queue.task_done()
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+        elapsed = time.monotonic() - start
+        self.batches += 1
+        self.orders += len(batch)
+        self.last_batch_size = len(batch)
+        self.max_batch_size = max(self.max_batch_size, len(batch))
+        self.last_batch_time = elapsed
+        self.max_batch_time = max(self.max_batch_time, elapsed)
+
+    async def run(self):
+        """
+        Process queued requests until cancelled.
+        """
+        self._closed = False
+        while True:
+            await self._process(await self._next_batch())
+
+    async def close(self):
+        """
+        Stop accepting requests and wait for the queued ones to be processed.
+        """
+        self._closed = True
+        await self.queue.join()
+        self._queue = None
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {
+            "batch_size": self.batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "queue_size": self.queue_size,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "orders": self.orders,
+            "rejected": self.rejected,
+            "failed_batches": self.failed_batches,
+            "failed_orders": self.failed_orders,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_size,
+            "avg_batch_size": round(self.orders / self.batches, 3)
+            if self.batches
+            else 0.0,
+            "last_batch_time_ms": round(self.last_batch_time * 1000, 3),
+            "max_batch_time_ms": round(self.max_batch_time * 1000, 3),
+        }
@@ -0,0 +1,54 @@
+"""
+Create upcoming partitions of the orders table and archive old ones.
+
+Usage: python -m orders.maintenance [--months-ahead N] [--archive-after N]
+"""
+
+from argparse import ArgumentParser
+
+from datetime import date
+
+import asyncio
+import logging
+
+from config import settings
+
+from database import engine
+
+from .partitions import add_months, archive_partitions, create_partitions
+
+
+async def main(months_ahead: int, archive_after: int):
+    try:
+        created = await create_partitions(months_ahead)
+        archived = []
+        if archive_after > 0:
+            before = add_months(date.today().replace(day=1), -archive_after)
+            archived = await archive_partitions(before)
+    finally:
+        await engine.dispose()
+    logging.info(
+        "Created %d order partitions and archived %d", len(created), len(archived)
+    )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Create upcoming order partitions and archive old ones."
+    )
+    parser.add_argument(
+        "--months-ahead",
+        type=int,
+        default=settings.ORDERS_PARTITION_MONTHS_AHEAD,
+        help="number of months after the current one to create partitions for",
+    )
+    parser.add_argument(
+        "--archive-after",
+        type=int,
+        default=settings.ORDERS_ARCHIVE_AFTER_MONTHS,
+        help="number of full months to keep before archiving a partition, 0 to disable",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    asyncio.run(main(args.months_ahead, args.archive_after))
@@ -1,22 +1,34 @@
-from typing import Literal, Union
+from typing import Dict, Literal, Optional, Tuple, Union
+
+from datetime import datetime
 
 from sqlmodel import SQLModel, Field
 from sqlmodel.sql.sqltypes import AutoString
 
 import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
 
 Status = Literal["in progress", "completed", "canceled"]
 
+# The statuses an order with a given status can be moved to.
+ALLOWED_TRANSITIONS: Dict[Status, Tuple[Status, ...]] = {
+    "in progress": ("completed", "canceled"),
+    "completed": ("in progress",),
+    "canceled": (),
+}
+
 
 class Order(SQLModel, table=True):
+    # Partitioned by month on created_at, which must therefore be part of the
+    # primary key; IDs still come from a sequence and stay unique.
     __tablename__ = "orders"
 
-    id: int = Field(primary_key=True)
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": True})
 
     user_id: int = Field(foreign_key="users.id")
 
     products: dict[str, dict[str, Union[int, float]]] = Field(
-        sa_column=sa.Column("products", sa.JSON(), nullable=False, default={})
+        sa_column=sa.Column("products", JSONB(), nullable=False, default={})
     )
     total_price: float = Field(nullable=False, default=0.0)
     status: Status = Field(
@@ -24,3 +36,14 @@ class Order(SQLModel, table=True):
             "status", AutoString(), nullable=False, default="in progress"
         )
     )
+    created_at: datetime = Field(default_factory=datetime.now, primary_key=True)
+
+
+class IdempotencyKey(SQLModel, table=True):
+    __tablename__ = "idempotency_keys"
+
+    user_id: int = Field(primary_key=True, foreign_key="users.id", ondelete="CASCADE")
+    key: str = Field(primary_key=True, max_length=255)
+
+    order_id: Optional[int] = None
+    created_at: datetime = Field(default_factory=datetime.now, nullable=False)
@@ -0,0 +1,257 @@
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from sqlalchemy import text
+
+from typing import List
+
+from datetime import date
+
+import asyncio
+import logging
+import re
+
+from config import settings
+
+from database import engine
+from database.session import session_maker
+
+logger = logging.getLogger(__name__)
+
+# Monthly partitions of `orders` are named orders_YYYY_MM. There is no
+# default partition, since it would rule out detaching partitions
+# concurrently: orders can only be created in months with a partition. The
+# app creates the upcoming partitions at startup and every
+# `ORDERS_PARTITION_CHECK_INTERVAL` seconds, besides
+# `python -m orders.maintenance`.
+PARTITION_NAME = re.compile(r"orders_(\d{4})_(\d{2})")
+
+# Advisory lock held while partitions are created, so that workers starting
+# together don't create the same partition.
+PARTITIONS_LOCK = 0x0D7E5
+
+COLUMNS = "id, user_id, products, total_price, status, created_at"
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"orders_{month:%Y_%m}"
+
+
+def _upcoming_months(
+    months_ahead: int = settings.ORDERS_PARTITION_MONTHS_AHEAD,
+) -> List[date]:
+    this_month = date.today().replace(day=1)
+    return [add_months(this_month, i) for i in range(months_ahead + 1)]
+
+
+async def get_partitions(db_session: AsyncSession) -> List[date]:
+    """
+    Retrieve the months that have a partition of `orders`.
+
+    Args:
+        db_session (AsyncSession): The asynchronous database session.
+
+    Returns:
+        List[date]: The first day of each month, in order.
+    """
+    res = await db_session.execute(
+        text(
+            "SELECT CAST(inhrelid AS regclass) FROM pg_inherits "
+            "WHERE inhparent = CAST('orders' AS regclass)"
+        )
+    )
+    months = []
+    for (name,) in res.all():
+        match = PARTITION_NAME.fullmatch(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+async def create_partitions(
+    months_ahead: int = settings.ORDERS_PARTITION_MONTHS_AHEAD,
+) -> List[str]:
+    """
+    Create the partitions of the current month and of the next `months_ahead`
+    months.
+
+    Each partition is created as a plain table and then attached, which
+    only takes a SHARE UPDATE EXCLUSIVE lock on `orders`. The partitions
+    are created in one transaction, under an advisory lock.
+
+    Args:
+        months_ahead (int): The number of months after the current one to create partitions for.
+
+    Returns:
+        List[str]: The names of the created partitions.
+    """
+    created = []
+    async with session_maker() as db_session:
+        await db_session.execute(
+            text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITIONS_LOCK}
+        )
+        existing = set(await get_partitions(db_session))
+
+        for month in sorted(set(_upcoming_months(months_ahead)) - existing):
+            name = partition_name(month)
+            await db_session.execute(
+                text(f"CREATE TABLE {name} (LIKE orders INCLUDING DEFAULTS)")
+            )
+            await db_session.execute(
+                text(
+                    f"ALTER TABLE orders ATTACH PARTITION {name} "
+                    f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+                )
+            )
+            created.append(name)
+        await db_session.commit()
+
+    for name in created:
+        logger.info("Created partition %s", name)
+    return created
+
+
+async def ensure_partitions():
+    """
+    Create the upcoming partitions at startup.
+
+    Failing to create them is only logged while the current month has a
+    partition, so that the app can run on a role without DDL privileges
+    when `python -m orders.maintenance` creates them instead.
+
+    Raises:
+        RuntimeError: If the current month has no partition, so no order can be created.
+    """
+    try:
+        await create_partitions()
+    except Exception:
+        logger.exception("Failed to create order partitions")
+
+    async with session_maker() as db_session:
+        existing = set(await get_partitions(db_session))
+    missing = [m for m in _upcoming_months() if m not in existing]
+    if missing and missing[0] == date.today().replace(day=1):
+        raise RuntimeError(
+            f"Orders can't be created: partition {partition_name(missing[0])} is missing"
+        )
+    if missing:
+        logger.error(
+            "Order partitions %s are missing",
+            ", ".join(partition_name(month) for month in missing),
+        )
+
+
+async def create_partitions_periodically():
+    """
+    Periodically create the upcoming partitions.
+
+    The interval is taken from `ORDERS_PARTITION_CHECK_INTERVAL`;
+    a non-positive value disables the task.
+    """
+    if settings.ORDERS_PARTITION_CHECK_INTERVAL <= 0:
+        return
+    while True:
+        await asyncio.sleep(settings.ORDERS_PARTITION_CHECK_INTERVAL)
+        try:
+            await create_partitions()
+        except Exception:
+            logger.exception("Failed to create order partitions")
+
+
+async def _get_pending_detaches(db_session: AsyncSession) -> set:
+    res = await db_session.execute(
+        text(
+            "SELECT CAST(CAST(inhrelid AS regclass) AS text) FROM pg_inherits "
+            "WHERE inhparent = CAST('orders' AS regclass) AND inhdetachpending"
+        )
+    )
+    return set(res.scalars().all())
+
+
+async def _detach(name: str, finalize: bool = False):
+    # DETACH ... CONCURRENTLY doesn't block reads and writes of `orders`, but
+    # it can't run in a transaction block. If it is interrupted, the
+    # partition is left pending and has to be detached with FINALIZE.
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(
+            text(
+                f"ALTER TABLE orders DETACH PARTITION {name} "
+                + ("FINALIZE" if finalize else "CONCURRENTLY")
+            )
+        )
+
+
+async def _has_orders_in_progress(name: str, db_session: AsyncSession) -> bool:
+    res = await db_session.execute(
+        text(f"SELECT EXISTS (SELECT FROM {name} WHERE status = 'in progress')")
+    )
+    return res.scalar()
+
+
+async def archive_partitions(before: date) -> List[str]:
+    """
+    Move the partitions of months ending on or before `before` to `orders_archive`.
+
+    Only partitions whose orders are all completed or canceled are archived.
+    A partition is detached concurrently first, so its orders can no longer
+    change while orders are still read and written, and then copied to the
+    archive and dropped. Partitions left pending by an interrupted detach
+    are detached with FINALIZE. Archived orders are no longer served by the
+    orders API; the sales rollups keep counting them.
+
+    Args:
+        before (date): The first day of the oldest month to keep.
+
+    Returns:
+        List[str]: The names of the archived partitions.
+    """
+    archived = []
+    async with session_maker() as db_session:
+        months = await get_partitions(db_session)
+        pending = await _get_pending_detaches(db_session)
+        await db_session.rollback()
+
+        for month in months:
+            if add_months(month, 1) > before:
+                break
+            name = partition_name(month)
+            if name in pending:
+                await _detach(name, finalize=True)
+            else:
+                in_progress = await _has_orders_in_progress(name, db_session)
+                # A concurrent detach waits for every open transaction.
+                await db_session.rollback()
+                if in_progress:
+                    logger.warning("Not archiving %s, it has orders in progress", name)
+                    continue
+                await _detach(name)
+
+            # An order may have gone back to "in progress" before the detach.
+            if await _has_orders_in_progress(name, db_session):
+                logger.warning("Not archiving %s, it has orders in progress", name)
+                await db_session.execute(
+                    text(
+                        f"ALTER TABLE orders ATTACH PARTITION {name} FOR VALUES "
+                        f"FROM ('{month}') TO ('{add_months(month, 1)}')"
+                    )
+                )
+                await db_session.commit()
+                continue
+
+            res = await db_session.execute(
+                text(
+                    f"INSERT INTO orders_archive ({COLUMNS}) "
+                    f"SELECT {COLUMNS} FROM {name}"
+                )
+            )
+            await db_session.execute(text(f"DROP TABLE {name}"))
+            await db_session.commit()
+            logger.info("Archived %d orders of %s", res.rowcount, name)
+            archived.append(name)
+
+    return archived
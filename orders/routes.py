@@ -1,19 +1,32 @@
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from typing import Annotated, Dict, List, Union
+from typing import Annotated, Dict, List, Literal, Optional, Union
 
-from database import get_db_session
+import asyncio
+import json
+
+from database import get_db_session, get_db_read_session, get_db_user_read_session
 
 from users import User
 
-from auth import get_current_user, admin
+from auth import get_authorized_user, admin
 
 from http_exceptions import AccessDenied
 
+from pagination import Limit, Page, Timestamp
+
+from conditional import Conditional
+
+from config import settings
+
+from .board import kitchen_board
+from .events import order_events
 from .models import Order, Status
+from .schemas import Board, BulkStatusUpdateSchema
 
 from . import service
 
@@ -21,42 +34,204 @@ from . import service
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
 
+async def _user_id(user_id: int) -> int:
+    return user_id
+
+
+async def _current_user_id(
+    current_user: Annotated[User, Depends(get_authorized_user)],
+) -> int:
+    return current_user.id
+
+
+async def _current_user_orders_conditional(
+    request: Request,
+    response: Response,
+    current_user: Annotated[User, Depends(get_authorized_user)],
+) -> Conditional:
+    conditional = Conditional(
+        request,
+        response,
+        [("orders", current_user.id)],
+        settings.ORDERS_CACHE_CONTROL,
+        settings.ORDERS_ETAG_TTL,
+    )
+    conditional.check()
+    return conditional
+
+
 @router.post("/", status_code=201, response_model=Dict[str, Union[str, Order]])
 async def create_order(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    idempotency_key: Annotated[Optional[str], Header(max_length=255)] = None,
+):
+    return await service.create(current_user.id, db_session, idempotency_key)
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_orders(
+    current_user: Annotated[User, Depends(admin)],
+    format: service.ExportFormat = "ndjson",
+    status: Optional[Status] = None,
+    created_from: Optional[Timestamp] = None,
+    created_to: Optional[Timestamp] = None,
+    flatten: bool = False,
+):
+    return StreamingResponse(
+        service.export(format, status, created_from, created_to, flatten),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="orders.{format}"'},
+    )
+
+
+@router.get("/events", response_class=StreamingResponse)
+async def stream_order_events(
+    current_user: Annotated[User, Depends(get_authorized_user)],
+    all: bool = False,
+):
+    if all and current_user.role != "admin":
+        raise AccessDenied()
+    user_id = None if all else current_user.id
+
+    async def stream():
+        async with order_events.subscribe(user_id) as queue:
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), settings.ORDER_EVENTS_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/events/stats/", response_model=Dict[str, Union[int, bool]])
+async def get_order_events_stats(
+    current_user: Annotated[User, Depends(admin)],
 ):
-    return await service.create(current_user.id, db_session)
+    return order_events.stats()
+
+
+@router.get("/board/", response_model=Board)
+async def get_kitchen_board(
+    current_user: Annotated[User, Depends(admin)],
+    limit: Limit = settings.PAGINATION_DEFAULT_LIMIT,
+):
+    if not kitchen_board.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Kitchen board is being built",
+            headers={"Retry-After": "5"},
+        )
+    return kitchen_board.snapshot(limit)
 
 
 @router.get("/{id}", response_model=Order)
 async def get_order_by_id(
     id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
 ):
     return await service.get(id, current_user, db_session)
 
 
-@router.get("/user/{user_id}", response_model=List[Order])
+@router.get("/user/{user_id}", response_model=Page[Order])
 async def get_orders_by_user_id(
     user_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
-    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
+    db_session: Annotated[AsyncSession, Depends(get_db_user_read_session(_user_id))],
+    limit: Limit = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    status: Optional[Status] = None,
+    created_from: Optional[Timestamp] = None,
+    created_to: Optional[Timestamp] = None,
 ):
     if current_user.id != user_id:
         if current_user.role != "admin":
             raise AccessDenied()
 
-    return await service.get_with_user_id(user_id, db_session)
+    return await service.get_with_user_id(
+        user_id, db_session, limit, after, sort, status, created_from, created_to
+    )
 
 
-@router.get("/user/current/", response_model=List[Order])
+@router.get("/user/current/", response_model=Page[Order])
 async def get_current_user_orders(
-    current_user: Annotated[User, Depends(get_current_user)],
-    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    conditional: Annotated[Conditional, Depends(_current_user_orders_conditional)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
+    db_session: Annotated[
+        AsyncSession, Depends(get_db_user_read_session(_current_user_id))
+    ],
+    limit: Limit = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    status: Optional[Status] = None,
+    created_from: Optional[Timestamp] = None,
+    created_to: Optional[Timestamp] = None,
 ):
-    return await service.get_with_user_id(current_user.id, db_session)
+    page = await service.get_with_user_id(
+        current_user.id,
+        db_session,
+        limit,
+        after,
+        sort,
+        status,
+        created_from,
+        created_to,
+    )
+    return conditional.tag(page)
+
+
+@router.get("/products/", response_model=Page[Order])
+async def get_orders_with_products(
+    product_id: Annotated[List[int], Query(min_length=1, max_length=100)],
+    current_user: Annotated[User, Depends(admin)],
+    db_session: Annotated[AsyncSession, Depends(get_db_read_session)],
+    match: Literal["any", "all"] = "any",
+    limit: Limit = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    status: Optional[Status] = None,
+    created_from: Optional[Timestamp] = None,
+    created_to: Optional[Timestamp] = None,
+):
+    return await service.get_with_products(
+        product_id,
+        db_session,
+        match,
+        limit,
+        after,
+        sort,
+        status,
+        created_from,
+        created_to,
+    )
+
+
+@router.get(
+    "/products/{product_id}/sales/", response_model=Dict[str, Union[int, float]]
+)
+async def get_product_sales(
+    product_id: int,
+    current_user: Annotated[User, Depends(admin)],
+    db_session: Annotated[AsyncSession, Depends(get_db_read_session)],
+    created_from: Optional[Timestamp] = None,
+    created_to: Optional[Timestamp] = None,
+):
+    return await service.get_product_sales(
+        product_id, db_session, created_from, created_to
+    )
 
 
 @router.patch("/{id}", response_model=Dict[str, Union[str, Order]])
@@ -66,4 +241,26 @@ async def update_order_status(
     current_user: Annotated[User, Depends(admin)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
 ):
-    return await service.update_status(id, status, current_user, db_session)
+    return await service.update_status(id, status, db_session)
+
+
+@router.patch("/", response_model=Dict[str, Union[str, List[int]]])
+async def update_order_statuses(
+    data: BulkStatusUpdateSchema,
+    current_user: Annotated[User, Depends(admin)],
+    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+):
+    return await service.update_status_many(
+        data.ids, data.status, data.expected, db_session
+    )
+
+
+@router.get("/intake/", response_model=Dict[str, Union[int, float]])
+async def get_order_intake_stats(
+    current_user: Annotated[User, Depends(admin)],
+):
+    if service.order_intake is None:
+        raise HTTPException(
+            status_code=404, detail="Batched order intake is not enabled"
+        )
+    return service.order_intake.stats()
@@ -0,0 +1,41 @@
+from pydantic import BaseModel, field_validator
+
+from fastapi import HTTPException
+
+from typing import Dict, List
+
+from datetime import datetime
+
+from .models import Status
+
+
+class BoardProduct(BaseModel):
+    product_id: int
+    quantity: int
+
+
+class BoardOrder(BaseModel):
+    id: int
+    user_id: int
+    created_at: datetime
+    products: Dict[int, int]
+
+
+class Board(BaseModel):
+    products: List[BoardProduct]
+    orders_count: int
+    orders: List[BoardOrder]
+
+
+class BulkStatusUpdateSchema(BaseModel):
+    ids: List[int]
+    status: Status
+    expected: Status = "in progress"
+
+    @field_validator("ids")
+    def validate_ids(cls, v: List[int]) -> List[int]:
+        if not 1 <= len(v) <= 1000:
+            raise HTTPException(
+                status_code=400, detail="Between 1 and 1000 order ids are required"
+            )
+        return v
@@ -2,6 +2,29 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 
 from sqlmodel import select
 
+from sqlalchemy import (
+    Float,
+    Integer,
+    any_,
+    bindparam,
+    cast,
+    delete,
+    func,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, array, insert
+
+from typing import AsyncIterator, Dict, List, Literal, Optional, Tuple, Union
+
+from datetime import date, datetime, timedelta
+
+import asyncio
+import csv
+import io
+import json
+import logging
+
 from fastapi import HTTPException
 
 from products import service as products_service
@@ -10,46 +33,275 @@ from users import User
 
 from carts import service as carts_service
 
+from analytics import service as analytics_service
+
 from http_exceptions import AccessDenied
 
-from .models import Order, Status
+from database import mark_user_write, read_session
+
+from conditional import validators
+from database.session import session_maker
+
+from pagination import Page, paginate
+
+from config import settings
+
+from .board import kitchen_board
+from .events import order_events
+from .intake import OrderIntake
+from .models import ALLOWED_TRANSITIONS, IdempotencyKey, Order, Status
+from .partitions import add_months
+
+logger = logging.getLogger(__name__)
 
+ExportFormat = Literal["ndjson", "csv"]
 
-async def create(user_id: int, db_session: AsyncSession):
+EXPORT_COLUMNS = ("id", "user_id", "status", "total_price", "created_at")
+EXPORT_ITEM_COLUMNS = ("product_id", "quantity", "price")
+
+
+async def _claim_idempotency_key(
+    user_id: int, key: str, db_session: AsyncSession
+) -> Optional[Order]:
+    """
+    Claim an idempotency key for the user, or find the order it was used for.
+
+    The key row is inserted in the caller's transaction, so a concurrent
+    request with the same key waits for it to commit or roll back. Expired
+    keys are claimed again as if they were new.
+
+    Raises:
+        HTTPException:
+            - 409 if the key is used but its order no longer exists.
+
+    Returns:
+        Optional[Order]: The order created with the key, or None if the key was claimed.
+    """
+    now = datetime.now()
+    stmt = insert(IdempotencyKey).values(user_id=user_id, key=key, created_at=now)
+    res = await db_session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+            set_={"order_id": None, "created_at": now},
+            where=IdempotencyKey.created_at
+            < now - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+        ).returning(IdempotencyKey.key)
+    )
+    if res.first() is not None:
+        return None
+
+    res = await db_session.exec(
+        select(Order)
+        .join(IdempotencyKey, IdempotencyKey.order_id == Order.id)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    )
+    order = res.first()
+    if order is None:
+        raise HTTPException(
+            status_code=409, detail="Idempotency key has already been used"
+        )
+    return order
+
+
+async def create(
+    user_id: int, db_session: AsyncSession, idempotency_key: Optional[str] = None
+):
     """
     Create a new order from the user's cart.
 
+    The cart is taken with its items locked, so concurrent requests can't
+    turn the same cart into two orders. With an idempotency key, a retry
+    returns the order created by the first request without writing anything.
+    When `ORDER_INTAKE` is "batched", the request is queued and created
+    together with others by `create_many`.
+
     Args:
         user_id (int): The ID of the user placing the order.
         db_session (AsyncSession): The asynchronous database session.
+        idempotency_key (Optional[str]): The client-supplied key identifying the request.
 
     Raises:
         HTTPException:
             - 400 if the user's cart is empty.
+            - 409 if the idempotency key is used but its order no longer exists.
+            - 503 if the order intake queue is full.
 
     Returns:
         dict: A dictionary containing a success message and the created order instance.
     """
-    cart = await carts_service.get(user_id, db_session)
-    if cart.products == {}:
-        raise HTTPException(status_code=400, detail="Cart is empty")
-
-    order = Order(**cart.model_dump())
-    cart.products = {}
-    cart.total_price = 0
-
-    db_session.add(cart)
-    db_session.add(order)
-    await db_session.commit()
+    if order_intake is not None:
+        return await order_intake.submit(user_id, idempotency_key)
+
+    if idempotency_key is not None:
+        order = await _claim_idempotency_key(user_id, idempotency_key, db_session)
+        if order is not None:
+            return {"message": "Order already created", "order": order}
+
+    try:
+        cart = await carts_service.take(user_id, db_session)
+        if cart.products == {}:
+            raise HTTPException(status_code=400, detail="Cart is empty")
+
+        order = Order(**cart.model_dump())
+
+        db_session.add(order)
+        await db_session.flush()
+        await analytics_service.record_orders([order], db_session)
+        if idempotency_key is not None:
+            await db_session.execute(
+                update(IdempotencyKey)
+                .where(
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.key == idempotency_key,
+                )
+                .values(order_id=order.id)
+            )
+        events = await order_events.prepare([order], "created", db_session)
+        await db_session.commit()
+    except BaseException:
+        carts_service.release_taken([user_id], db_session)
+        raise
+    carts_service.commit_taken([user_id], db_session)
     await db_session.refresh(order)
 
+    mark_user_write(user_id)
+    validators.invalidate(("orders", user_id))
+    kitchen_board.update(order)
+    order_events.publish(events)
+
     return {"message": "Order created", "order": order}
 
 
+async def create_many(
+    requests: List[Tuple[int, Optional[str]]],
+) -> List[Union[dict, HTTPException]]:
+    """
+    Create orders for a batch of requests in a single transaction.
+
+    Idempotency keys are claimed, carts taken and orders inserted with one
+    statement each, so the cost of the commit is shared by the whole batch.
+    A user's cart goes to the first of their requests; later ones get the
+    same order if they carry the same key, or a 400 otherwise.
+
+    Args:
+        requests (List[Tuple[int, Optional[str]]]): The (user ID, idempotency key) pairs.
+
+    Returns:
+        List[Union[dict, HTTPException]]: For each request, either the result
+            `create` would have returned or the exception it would have raised.
+    """
+    keys = {(u, k) for u, k in requests if k is not None}
+    claimed = set()
+    used = {}
+
+    async with session_maker(expire_on_commit=False) as db_session:
+        if keys:
+            now = datetime.now()
+            # Rows are upserted in key order so concurrent batches can't deadlock.
+            stmt = insert(IdempotencyKey).values(
+                [{"user_id": u, "key": k, "created_at": now} for u, k in sorted(keys)]
+            )
+            res = await db_session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+                    set_={"order_id": None, "created_at": now},
+                    where=IdempotencyKey.created_at
+                    < now - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                ).returning(IdempotencyKey.user_id, IdempotencyKey.key)
+            )
+            claimed = {tuple(row) for row in res.all()}
+
+        if keys - claimed:
+            res = await db_session.execute(
+                select(IdempotencyKey.user_id, IdempotencyKey.key, Order)
+                .join(Order, Order.id == IdempotencyKey.order_id)
+                .where(
+                    tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_(
+                        keys - claimed
+                    )
+                )
+            )
+            used = {(u, k): order for u, k, order in res.all()}
+
+        taken = {u for u, k in requests if k is None or (u, k) in claimed}
+        try:
+            carts = await carts_service.take_many(taken, db_session)
+
+            results = []
+            created = {}
+            for user_id, key in requests:
+                if (user_id, key) in used:
+                    results.append(
+                        {
+                            "message": "Order already created",
+                            "order": used[user_id, key],
+                        }
+                    )
+                elif key is not None and (user_id, key) not in claimed:
+                    results.append(
+                        HTTPException(
+                            status_code=409,
+                            detail="Idempotency key has already been used",
+                        )
+                    )
+                elif key is not None and (user_id, key) in created:
+                    results.append(
+                        {
+                            "message": "Order already created",
+                            "order": created[user_id, key],
+                        }
+                    )
+                elif user_id in carts and carts[user_id].products != {}:
+                    order = Order(**carts.pop(user_id).model_dump())
+                    created[user_id, key] = order
+                    results.append({"message": "Order created", "order": order})
+                else:
+                    results.append(
+                        HTTPException(status_code=400, detail="Cart is empty")
+                    )
+
+            db_session.add_all(created.values())
+            await db_session.flush()
+            await analytics_service.record_orders(created.values(), db_session)
+
+            keyed = [(u, k, order.id) for (u, k), order in created.items() if k]
+            if keyed:
+                await db_session.execute(
+                    update(IdempotencyKey),
+                    [{"user_id": u, "key": k, "order_id": id} for u, k, id in keyed],
+                )
+            unused = claimed - set(created)
+            if unused:
+                await db_session.execute(
+                    delete(IdempotencyKey).where(
+                        tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_(unused)
+                    )
+                )
+
+            events = await order_events.prepare(created.values(), "created", db_session)
+            await db_session.commit()
+        except BaseException:
+            carts_service.release_taken(taken, db_session)
+            raise
+        carts_service.commit_taken(taken, db_session)
+
+    for (user_id, _), order in created.items():
+        mark_user_write(user_id)
+        validators.invalidate(("orders", user_id))
+        kitchen_board.update(order)
+    order_events.publish(events)
+
+    return results
+
+
 async def get(id: int, current_user: User, db_session: AsyncSession):
     """
     Retrieve an order by its ID, enforcing access control.
 
+    The ID doesn't tell which monthly partition holds the order, so the
+    lookup probes the primary key index of every partition: it costs
+    O(partitions), which archiving old partitions keeps bounded.
+
     Args:
         id (int): The ID of the order to retrieve.
         current_user (User): The user requesting the order.
@@ -75,21 +327,150 @@ async def get(id: int, current_user: User, db_session: AsyncSession):
     return order
 
 
-async def get_with_user_id(user_id: int, db_session: AsyncSession):
+async def get_with_user_id(
+    user_id: int,
+    db_session: AsyncSession,
+    limit: int = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    status: Optional[Status] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> Page[Order]:
     """
-    Retrieve all orders for a specific user.
+    Retrieve a page of orders for a specific user.
+
+    Without `created_from`, all of the user's orders are returned, unless
+    `ORDERS_LIST_DEFAULT_MONTHS` is set: then only orders of the last that
+    many months are returned, so that only their partitions are scanned.
 
     Args:
         user_id (int): The ID of the user whose orders to retrieve.
         db_session (AsyncSession): The asynchronous database session.
+        limit (int): The maximum number of orders to return.
+        after (Optional[str]): The cursor of the previous page.
+        sort (str): The field to sort by ("id", "created_at" or "total_price"), "-" prefix for descending.
+        status (Optional[Status]): Only return orders with this status.
+        created_from (Optional[datetime]): Only return orders created at or after this time.
+        created_to (Optional[datetime]): Only return orders created before this time.
 
     Returns:
-        List[Order]: A list of orders belonging to the specified user.
+        Page[Order]: A page of orders belonging to the specified user.
     """
-    res = await db_session.exec(select(Order).where(Order.user_id == user_id))
-    orders = res.all()
+    if created_from is None and settings.ORDERS_LIST_DEFAULT_MONTHS > 0:
+        month = add_months(
+            date.today().replace(day=1), 1 - settings.ORDERS_LIST_DEFAULT_MONTHS
+        )
+        created_from = datetime(month.year, month.month, 1)
+
+    query = select(Order).where(Order.user_id == user_id)
+    if status is not None:
+        query = query.where(Order.status == status)
+    if created_from is not None:
+        query = query.where(Order.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(Order.created_at < created_to)
+
+    return await paginate(
+        db_session,
+        query,
+        Order,
+        limit,
+        after,
+        sort,
+        ("id", "created_at", "total_price"),
+    )
+
+
+async def get_with_products(
+    product_ids: List[int],
+    db_session: AsyncSession,
+    match: Literal["any", "all"] = "any",
+    limit: int = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    status: Optional[Status] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> Page[Order]:
+    """
+    Retrieve a page of orders containing any or all of the given products.
+    The key lookups are served by the GIN index on `orders.products`.
 
-    return orders
+    Args:
+        product_ids (List[int]): The IDs of the products to look for.
+        db_session (AsyncSession): The asynchronous database session.
+        match (str): Whether orders must contain "any" or "all" of the products.
+        limit (int): The maximum number of orders to return.
+        after (Optional[str]): The cursor of the previous page.
+        sort (str): The field to sort by ("id", "created_at" or "total_price"), "-" prefix for descending.
+        status (Optional[Status]): Only return orders with this status.
+        created_from (Optional[datetime]): Only return orders created at or after this time.
+        created_to (Optional[datetime]): Only return orders created before this time.
+
+    Returns:
+        Page[Order]: A page of orders containing the products.
+    """
+    keys = array([str(id) for id in product_ids])
+    query = select(Order).where(
+        Order.products.has_all(keys) if match == "all" else Order.products.has_any(keys)
+    )
+    if status is not None:
+        query = query.where(Order.status == status)
+    if created_from is not None:
+        query = query.where(Order.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(Order.created_at < created_to)
+
+    return await paginate(
+        db_session,
+        query,
+        Order,
+        limit,
+        after,
+        sort,
+        ("id", "created_at", "total_price"),
+    )
+
+
+async def get_product_sales(
+    product_id: int,
+    db_session: AsyncSession,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> Dict[str, Union[int, float]]:
+    """
+    Sum up the orders, quantity and revenue of a product, canceled orders excluded.
+
+    Args:
+        product_id (int): The ID of the product.
+        db_session (AsyncSession): The asynchronous database session.
+        created_from (Optional[datetime]): Only count orders created at or after this time.
+        created_to (Optional[datetime]): Only count orders created before this time.
+
+    Returns:
+        dict: The product ID, the number of orders, the quantity sold and the revenue.
+    """
+    item = Order.products[str(product_id)]
+    query = select(
+        func.count(),
+        func.coalesce(func.sum(cast(item["quantity"].astext, Integer)), 0),
+        func.coalesce(func.sum(cast(item["price"].astext, Float)), 0.0),
+    ).where(Order.products.has_key(str(product_id)), Order.status != "canceled")
+    if created_from is not None:
+        query = query.where(Order.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(Order.created_at < created_to)
+
+    res = await db_session.exec(query)
+    orders, quantity, revenue = res.one()
+
+    return {
+        "product_id": product_id,
+        "orders": orders,
+        "quantity": quantity,
+        "revenue": revenue,
+    }
 
 
 async def get_all(db_session: AsyncSession):
@@ -108,27 +489,267 @@ async def get_all(db_session: AsyncSession):
     return orders
 
 
-async def update_status(
-    id: int, status: Status, current_user: User, db_session: AsyncSession
-):
+def _export_records(row, flatten: bool):
+    record = {
+        "id": row.id,
+        "user_id": row.user_id,
+        "status": row.status,
+        "total_price": row.total_price,
+        "created_at": row.created_at.isoformat(),
+    }
+    if not flatten:
+        yield {**record, "products": row.products}
+        return
+    for product_id, item in row.products.items():
+        yield {
+            **record,
+            "product_id": int(product_id),
+            "quantity": item["quantity"],
+            "price": item["price"],
+        }
+
+
+async def export(
+    format: ExportFormat = "ndjson",
+    status: Optional[Status] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    flatten: bool = False,
+) -> AsyncIterator[str]:
     """
-    Update the status of an order.
+    Stream orders in ID order as NDJSON or CSV.
+
+    Orders are read from the read replica through a server-side cursor,
+    `ORDERS_EXPORT_CHUNK_SIZE` rows at a time, and each chunk is serialized
+    and yielded before the next is fetched, so memory use does not depend
+    on the number of orders. The function opens its own session because it
+    outlives the request handler.
+
+    Args:
+        format (ExportFormat): "ndjson" for one JSON object per line, or "csv".
+        status (Optional[Status]): Only export orders with this status.
+        created_from (Optional[datetime]): Only export orders created at or after this time.
+        created_to (Optional[datetime]): Only export orders created before this time.
+        flatten (bool): Export one record per line item instead of per order.
+
+    Yields:
+        str: Chunks of the exported document.
+    """
+    query = select(
+        Order.id,
+        Order.user_id,
+        Order.status,
+        Order.total_price,
+        Order.created_at,
+        Order.products,
+    ).order_by(Order.id)
+    if status is not None:
+        query = query.where(Order.status == status)
+    if created_from is not None:
+        query = query.where(Order.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(Order.created_at < created_to)
+
+    columns = EXPORT_COLUMNS + (EXPORT_ITEM_COLUMNS if flatten else ("products",))
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, columns)
+
+    if format == "csv":
+        writer.writeheader()
+
+    async with read_session() as db_session:
+        res = await db_session.stream(
+            query.execution_options(yield_per=settings.ORDERS_EXPORT_CHUNK_SIZE)
+        )
+        async for rows in res.partitions():
+            for row in rows:
+                for record in _export_records(row, flatten):
+                    if format == "csv":
+                        if not flatten:
+                            record["products"] = json.dumps(record["products"])
+                        writer.writerow(record)
+                    else:
+                        buffer.write(json.dumps(record))
+                        buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def _transition(
+    ids: List[int],
+    status: Status,
+    expected: List[Status],
+    db_session: AsyncSession,
+) -> List[Tuple[Order, Status]]:
+    """
+    Move the orders among `ids` whose status is one of `expected` to `status`
+    with a single UPDATE ... RETURNING, and commit.
+
+    Like `get`, finding the orders by ID probes every partition; the update
+    then joins on the whole primary key, so it touches only their partitions.
+
+    Returns:
+        List[Tuple[Order, Status]]: The updated orders with their previous status.
+    """
+    # Rows are locked in ID order so concurrent bulk updates can't deadlock.
+    old = (
+        select(Order.id, Order.created_at, Order.status)
+        .where(
+            Order.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))),
+            Order.status.in_(expected),
+        )
+        .order_by(Order.id)
+        .with_for_update()
+        .subquery()
+    )
+    res = await db_session.execute(
+        update(Order)
+        .where(Order.id == old.c.id, Order.created_at == old.c.created_at)
+        .values(status=status)
+        .returning(*Order.__table__.columns, old.c.status.label("old_status"))
+        .execution_options(synchronize_session=False)
+    )
+    updated = [
+        (Order.model_validate(row), row.old_status) for row in res.mappings().all()
+    ]
+
+    orders = [order for order, _ in updated]
+    for order, old_status in updated:
+        await analytics_service.record_status_change(order, old_status, db_session)
+    events = await order_events.prepare(orders, "updated", db_session)
+    await db_session.commit()
+
+    for order in orders:
+        mark_user_write(order.user_id)
+        validators.invalidate(("orders", order.user_id))
+        kitchen_board.update(order)
+    order_events.publish(events)
+
+    return updated
+
+
+async def update_status(id: int, status: Status, db_session: AsyncSession):
+    """
+    Update the status of an order, if `ALLOWED_TRANSITIONS` permits it.
+
+    The order is updated with one conditional UPDATE ... RETURNING; it is
+    only read separately when the update doesn't apply.
 
     Args:
         id (int): The ID of the order to update.
         status (Status): The new status to set for the order.
-        current_user (User): The user requesting the status update.
         db_session (AsyncSession): The asynchronous database session.
 
+    Raises:
+        HTTPException:
+            - 404 if the order does not exist.
+            - 409 if the order can't be moved from its current status to `status`.
+
     Returns:
         dict: A dictionary containing a success message and the updated order instance.
     """
-    order = await get(id, current_user, db_session)
+    expected = [s for s, targets in ALLOWED_TRANSITIONS.items() if status in targets]
+    updated = await _transition([id], status, expected, db_session)
+    if updated:
+        return {"message": "Order status updated", "order": updated[0][0]}
+
+    res = await db_session.exec(select(Order).where(Order.id == id))
+    order = res.first()
+    if order is None:
+        raise HTTPException(status_code=404, detail=f"Order with id {id} not found")
+    if order.status == status:
+        return {"message": "Order status updated", "order": order}
+    raise HTTPException(
+        status_code=409,
+        detail=f"Order status can't be changed from {order.status} to {status}",
+    )
 
-    order.status = status
 
-    db_session.add(order)
+async def update_status_many(
+    ids: List[int], status: Status, expected: Status, db_session: AsyncSession
+):
+    """
+    Move many orders from the `expected` status to `status` in one statement.
+
+    Args:
+        ids (List[int]): The IDs of the orders to update.
+        status (Status): The new status to set for the orders.
+        expected (Status): The status the orders must currently have.
+        db_session (AsyncSession): The asynchronous database session.
+
+    Raises:
+        HTTPException:
+            - 400 if `ALLOWED_TRANSITIONS` doesn't allow moving from `expected` to `status`.
+
+    Returns:
+        dict: A dictionary containing a success message, the IDs of the updated
+            orders and the IDs of the orders that were skipped because they
+            don't exist or don't have the `expected` status.
+    """
+    if status not in ALLOWED_TRANSITIONS[expected]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Order status can't be changed from {expected} to {status}",
+        )
+
+    updated = await _transition(ids, status, [expected], db_session)
+    updated_ids = {order.id for order, _ in updated}
+
+    return {
+        "message": "Order statuses updated",
+        "updated": sorted(updated_ids),
+        "skipped": sorted(set(ids) - updated_ids),
+    }
+
+
+async def delete_expired_idempotency_keys(db_session: AsyncSession) -> int:
+    """
+    Delete idempotency keys older than `IDEMPOTENCY_KEY_TTL` seconds.
+
+    Args:
+        db_session (AsyncSession): The asynchronous database session.
+
+    Returns:
+        int: The number of deleted keys.
+    """
+    cutoff = datetime.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    res = await db_session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff)
+    )
     await db_session.commit()
-    await db_session.refresh(order)
+    return res.rowcount
+
 
-    return {"message": "Order status updated", "order": order}
+async def cleanup_idempotency_keys():
+    """
+    Periodically delete expired idempotency keys.
+
+    The interval is taken from `IDEMPOTENCY_KEY_CLEANUP_INTERVAL`;
+    a non-positive value disables the cleanup.
+    """
+    if settings.IDEMPOTENCY_KEY_CLEANUP_INTERVAL <= 0:
+        return
+    while True:
+        await asyncio.sleep(settings.IDEMPOTENCY_KEY_CLEANUP_INTERVAL)
+        try:
+            async with session_maker() as db_session:
+                deleted = await delete_expired_idempotency_keys(db_session)
+            logger.info("Deleted %d expired idempotency keys", deleted)
+        except Exception:
+            logger.exception("Failed to delete expired idempotency keys")
+
+
+order_intake: Optional[OrderIntake] = (
+    OrderIntake(
+        create_many,
+        batch_size=settings.ORDER_INTAKE_BATCH_SIZE,
+        max_wait=settings.ORDER_INTAKE_MAX_WAIT,
+        queue_size=settings.ORDER_INTAKE_QUEUE_SIZE,
+    )
+    if settings.ORDER_INTAKE == "batched"
+    else None
+)
@@ -0,0 +1,136 @@
+from pydantic import AfterValidator, BaseModel
+
+from fastapi import HTTPException, Query
+
+from sqlalchemy import tuple_
+from sqlalchemy.types import TypeDecorator
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import SelectOfScalar
+
+from typing import Annotated, Any, Generic, List, Optional, Sequence, TypeVar
+
+from datetime import datetime, timezone
+
+import base64
+import binascii
+import json
+
+from config import settings
+
+T = TypeVar("T")
+
+Limit = Annotated[int, Query(ge=1, le=settings.PAGINATION_MAX_LIMIT)]
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """
+    Convert a timezone-aware datetime to the naive UTC datetimes stored in
+    the database. Naive datetimes are returned as they are.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# A datetime query parameter, e.g. "2025-01-01T00:00:00Z", compared with
+# naive timestamp columns.
+Timestamp = Annotated[datetime, AfterValidator(to_naive_utc)]
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(value: Any, id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, id]).encode()).decode()
+
+
+def decode_cursor(cursor: str, column: Any) -> tuple[Any, int]:
+    try:
+        value, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        sql_type = column.type
+        if isinstance(sql_type, TypeDecorator):
+            # e.g. sqlmodel's AutoString, which doesn't tell its Python type.
+            sql_type = sql_type.impl_instance
+        python_type = sql_type.python_type
+        if python_type is datetime:
+            value = to_naive_utc(datetime.fromisoformat(value))
+        elif python_type is float and type(value) is int:
+            value = float(value)
+        # The values are compared with the sort column in the query, so a
+        # value of another type would only fail in the database.
+        if (
+            not isinstance(value, python_type)
+            or isinstance(value, bool)
+            or type(id) is not int
+        ):
+            raise TypeError("Cursor value doesn't match the sort field")
+        return value, id
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def paginate(
+    db_session: AsyncSession,
+    query: SelectOfScalar,
+    model: type[SQLModel],
+    limit: int,
+    after: Optional[str] = None,
+    sort: str = "id",
+    sortable: Sequence[str] = ("id",),
+) -> Page:
+    """
+    Fetch one page of a query using keyset pagination.
+
+    Rows are ordered by the sort field and then by id, and the cursor holds
+    the sort value and id of the last row on the page, so the next page is
+    found with an index range scan instead of an OFFSET.
+
+    Args:
+        db_session (AsyncSession): The asynchronous database session.
+        query (SelectOfScalar): The filtered select of `model` to paginate.
+        model (type[SQLModel]): The model being selected. Must have an `id` column.
+        limit (int): The maximum number of items on the page.
+        after (Optional[str]): The `next_cursor` of the previous page.
+        sort (str): The field to sort by, prefixed with "-" for descending order.
+        sortable (Sequence[str]): The fields that are allowed in `sort`.
+
+    Raises:
+        HTTPException:
+            - 400 if the sort field is not allowed or the cursor is invalid.
+
+    Returns:
+        Page: The page items and the cursor of the next page, if there is one.
+    """
+    descending = sort.startswith("-")
+    field = sort.removeprefix("-")
+    if field not in sortable:
+        raise HTTPException(status_code=400, detail=f"Can't sort by '{field}'")
+
+    column = getattr(model, field)
+    if field == "id":
+        key, order_by = model.id, [model.id]
+    else:
+        key, order_by = tuple_(column, model.id), [column, model.id]
+
+    if after is not None:
+        value, id = decode_cursor(after, column)
+        bound = id if field == "id" else tuple_(value, id)
+        query = query.where(key < bound if descending else key > bound)
+
+    if descending:
+        order_by = [c.desc() for c in order_by]
+
+    res = await db_session.exec(query.order_by(*order_by).limit(limit + 1))
+    items = res.all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(getattr(items[-1], field), items[-1].id)
+
+    return Page(items=items, next_cursor=next_cursor)
@@ -0,0 +1,53 @@
+from typing import List
+
+from cache import TTLCache
+
+from catalog import on_change
+
+from conditional import validators
+
+from config import settings
+
+from database import mark_catalog_write
+
+product_cache = TTLCache(
+    maxsize=settings.CATALOG_CACHE_SIZE, ttl=settings.CATALOG_CACHE_TTL
+)
+product_list_cache = TTLCache(
+    maxsize=settings.CATALOG_CACHE_SIZE, ttl=settings.CATALOG_CACHE_TTL
+)
+
+
+def invalidate_product(id: int):
+    """
+    Drop a product and every cached product page after the product is written.
+
+    Args:
+        id (int): The ID of the changed product.
+    """
+    product_cache.pop(id)
+    product_list_cache.clear()
+    validators.invalidate("products")
+    mark_catalog_write()
+
+
+def invalidate_category_products(category_id: int):
+    """
+    Drop the products of a category and every cached product page,
+    e.g. after the category is deleted and its products are cascaded.
+
+    Args:
+        category_id (int): The ID of the changed category.
+    """
+    product_cache.evict(lambda product: product.category_id == category_id)
+    product_list_cache.clear()
+    validators.invalidate("products")
+    mark_catalog_write()
+
+
+@on_change
+def _apply_change(products: List[int], categories: List[int]):
+    for id in products:
+        invalidate_product(id)
+    for id in categories:
+        invalidate_category_products(id)
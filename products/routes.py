@@ -3,15 +3,22 @@ from fastapi import APIRouter, Depends, Response
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from typing import Annotated, Dict, List, Union
+from typing import Annotated, Dict, Optional, Union
 
-from database import get_db_session
+from database import get_db_session, get_db_catalog_read_session
 
 from auth import admin
 
 from users import User
 
+from pagination import Limit, Page
 
+from conditional import Conditional, conditional_get
+
+from config import settings
+
+
+from .cache import product_cache, product_list_cache
 from .models import Product
 from .schemas import CreateProductSchema, UpdateProductSchema
 
@@ -20,6 +27,19 @@ from . import service
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
+ProductsConditional = Annotated[
+    Conditional,
+    Depends(conditional_get("products", cache_control=settings.CATALOG_CACHE_CONTROL)),
+]
+CategoryProductsConditional = Annotated[
+    Conditional,
+    Depends(
+        conditional_get(
+            "products", "categories", cache_control=settings.CATALOG_CACHE_CONTROL
+        )
+    ),
+]
+
 
 @router.post("/", status_code=201, response_model=Dict[str, Union[str, Product]])
 async def create_product(
@@ -32,28 +52,58 @@ async def create_product(
 
 @router.get("/{id}", response_model=Product)
 async def get_product_by_id(
+    conditional: ProductsConditional,
     id: int,
-    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    db_session: Annotated[AsyncSession, Depends(get_db_catalog_read_session)],
 ):
-    return await service.get(id, db_session)
+    return conditional.tag(await service.get(id, db_session, cached=True))
 
 
-@router.get("/category/{category_slug}", response_model=List[Product])
+@router.get("/category/{category_slug}", response_model=Page[Product])
 async def get_products_by_category_slug(
+    conditional: CategoryProductsConditional,
     category_slug: str,
-    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    db_session: Annotated[AsyncSession, Depends(get_db_catalog_read_session)],
+    limit: Limit = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
 ):
-    return await service.get_with_category_slug(category_slug, db_session)
+    return conditional.tag(
+        await service.get_with_category_slug(
+            category_slug, db_session, limit, after, sort
+        )
+    )
 
 
-@router.get("/all/", response_model=List[Product])
+@router.get("/all/", response_model=Page[Product])
 async def get_all_products(
-    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    conditional: ProductsConditional,
+    db_session: Annotated[AsyncSession, Depends(get_db_catalog_read_session)],
+    limit: Limit = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+):
+    return conditional.tag(
+        await service.get_all(
+            db_session, limit, after, sort, category_id, min_price, max_price
+        )
+    )
+
+
+@router.get("/cache/", response_model=Dict[str, Dict[str, Union[int, float]]])
+async def get_product_cache_stats(
+    current_user: Annotated[User, Depends(admin)],
 ):
-    return await service.get_all(db_session)
+    return {"items": product_cache.stats(), "lists": product_list_cache.stats()}
 
 
-@router.patch("/{id}", response_model=Dict[str, Union[str, Product]])
+@router.patch(
+    "/{id}",
+    response_model=Dict[str, Union[str, Product, Dict[str, Union[int, float]]]],
+)
 async def update_product(
     id: int,
     data: UpdateProductSchema,
@@ -1,19 +1,32 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 
+from typing import Optional
+
+import logging
+
 from sqlalchemy.exc import IntegrityError
 
 from fastapi import HTTPException
 
 from http_exceptions import ObjectWithIdNotFound
 
-from categories import service as categories_service
+from catalog import notify_change
+
+from categories.cache import slug_index
 
 from config import settings
 
+from pagination import Page, paginate
+
+from carts import service as carts_service
+
+from .cache import product_cache, product_list_cache, invalidate_product
 from .models import Product
 from .schemas import CreateProductSchema, UpdateProductSchema
 
+logger = logging.getLogger(__name__)
+
 
 async def create(data: CreateProductSchema, db_session: AsyncSession):
     """
@@ -34,6 +47,8 @@ async def create(data: CreateProductSchema, db_session: AsyncSession):
 
     try:
         db_session.add(product)
+        await db_session.flush()
+        await notify_change(db_session, products=[product.id])
         await db_session.commit()
         await db_session.refresh(product)
     except IntegrityError:
@@ -41,12 +56,15 @@ async def create(data: CreateProductSchema, db_session: AsyncSession):
             status_code=400, detail=f"Category with id {data.category_id} is not exist"
         )
 
+    invalidate_product(product.id)
+
     return {"message": "Product created", "product": product}
 
 
 async def get(
     id: int,
     db_session: AsyncSession,
+    cached: bool = False,
 ):
     """
     Retrieve a product by its unique ID.
@@ -54,6 +72,8 @@ async def get(
     Args:
         id (int): The ID of the product to retrieve.
         db_session (AsyncSession): The asynchronous database session.
+        cached (bool): Serve a detached copy from the catalog cache when possible.
+            Don't use it for products that are going to be modified.
 
     Raises:
         ObjectWithIdNotFound: If no product with the given ID exists.
@@ -61,48 +81,111 @@ async def get(
     Returns:
         Product: The product instance with the specified ID.
     """
+    if cached:
+        product = product_cache.get(id)
+        if product is not None:
+            return product
+
     res = await db_session.exec(select(Product).where(Product.id == id))
     product = res.first()
 
     if product is None:
         raise ObjectWithIdNotFound(id, Product)
+
+    if cached:
+        product = Product.model_validate(product)
+        product_cache.set(id, product)
     return product
 
 
-async def get_with_category_slug(category_slug: str, db_session: AsyncSession):
+async def get_with_category_slug(
+    category_slug: str,
+    db_session: AsyncSession,
+    limit: int = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+) -> Page[Product]:
     """
-    Retrieve all products associated with a category identified by its slug.
+    Retrieve a page of products associated with a category identified by its slug,
+    served from the catalog cache when possible.
 
     Args:
         category_slug (str): The slug of the category.
         db_session (AsyncSession): The asynchronous database session.
+        limit (int): The maximum number of products to return.
+        after (Optional[str]): The cursor of the previous page.
+        sort (str): The field to sort by ("id", "price" or "title"), "-" prefix for descending.
+
+    Raises:
+        HTTPException:
+            - 404 if no category with the given slug exists. Checked against the
+              in-memory slug index, without a database round-trip.
 
     Returns:
-        List[Product]: A list of products belonging to the specified category.
+        Page[Product]: A page of products belonging to the specified category.
     """
-    category = await categories_service.get_with_slug(category_slug, db_session)
-    res = await db_session.exec(
-        select(Product).where(Product.category_id == category.id)
-    )
-    products = res.all()
-
-    return products
+    key = ("category", category_slug, limit, after, sort)
+    page = product_list_cache.get(key)
+    if page is None:
+        category_id = await slug_index.get(category_slug, db_session)
+        if category_id is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Category with slug '{category_slug}' not found",
+            )
+        query = select(Product).where(Product.category_id == category_id)
+
+        page = await paginate(
+            db_session, query, Product, limit, after, sort, ("id", "price", "title")
+        )
+        page.items = [Product.model_validate(p) for p in page.items]
+        product_list_cache.set(key, page)
+    return page
 
 
-async def get_all(db_session: AsyncSession):
+async def get_all(
+    db_session: AsyncSession,
+    limit: int = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> Page[Product]:
     """
-    Retrieve all products from the database.
+    Retrieve a page of products, served from the catalog cache when possible.
 
     Args:
         db_session (AsyncSession): The asynchronous database session.
+        limit (int): The maximum number of products to return.
+        after (Optional[str]): The cursor of the previous page.
+        sort (str): The field to sort by ("id", "price" or "title"), "-" prefix for descending.
+        category_id (Optional[int]): Only return products of this category.
+        min_price (Optional[float]): Only return products at least this expensive.
+        max_price (Optional[float]): Only return products at most this expensive.
 
     Returns:
-        List[Product]: A list of all product instances.
+        Page[Product]: A page of product instances.
     """
-    res = await db_session.exec(select(Product))
-    products = res.all()
-
-    return products
+    key = ("all", limit, after, sort, category_id, min_price, max_price)
+    page = product_list_cache.get(key)
+    if page is not None:
+        return page
+
+    query = select(Product)
+    if category_id is not None:
+        query = query.where(Product.category_id == category_id)
+    if min_price is not None:
+        query = query.where(Product.price >= min_price)
+    if max_price is not None:
+        query = query.where(Product.price <= max_price)
+
+    page = await paginate(
+        db_session, query, Product, limit, after, sort, ("id", "price", "title")
+    )
+    page.items = [Product.model_validate(p) for p in page.items]
+    product_list_cache.set(key, page)
+    return page
 
 
 async def update(
@@ -111,7 +194,8 @@ async def update(
     db_session: AsyncSession,
 ):
     """
-    Update an existing product's information.
+    Update an existing product's information. A price change is applied to
+    every cart holding the product in the same transaction.
 
     Args:
         id (int): The ID of the product to update.
@@ -119,19 +203,35 @@ async def update(
         db_session (AsyncSession): The asynchronous database session.
 
     Returns:
-        dict: A dictionary containing a success message and the updated product instance.
+        dict: A dictionary containing a success message, the updated product instance
+            and, if the price changed, the repricing report.
     """
     product = await get(id, db_session)
+    repriced = data.price is not None and data.price != product.price
 
     for k, v in data.model_dump().items():
         if v is not None:
             setattr(product, k, v)
 
     db_session.add(product)
+    if repriced:
+        repriced = await carts_service.reprice_product(id, data.price, db_session)
+    await notify_change(db_session, products=[id])
     await db_session.commit()
     await db_session.refresh(product)
 
-    return {"message": "Product updated", "product": product}
+    invalidate_product(id)
+
+    if not repriced:
+        return {"message": "Product updated", "product": product}
+
+    logger.info(
+        "Repriced product %s in %s carts in %s ms",
+        id,
+        repriced["carts"],
+        repriced["time_ms"],
+    )
+    return {"message": "Product updated", "product": product, "repriced": repriced}
 
 
 async def delete(id: int, db_session: AsyncSession):
@@ -151,4 +251,7 @@ async def delete(id: int, db_session: AsyncSession):
     product = await get(id, db_session)
 
     await db_session.delete(product)
+    await notify_change(db_session, products=[id])
     await db_session.commit()
+
+    invalidate_product(id)
@@ -1,3 +1,4 @@
 from .routes import router as router
 
+from .models import DiningTable as DiningTable
 from .models import Reservation as Reservation
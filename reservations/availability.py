@@ -0,0 +1,254 @@
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select
+
+from sqlalchemy import func
+
+from typing import Dict, List, Tuple
+
+from datetime import date, datetime, timedelta
+
+import time
+
+from cache import TTLCache
+
+from config import settings
+
+from .models import DiningTable, Reservation
+from .schemas import Availability, Slot
+
+# Maps each table id to a bitmap of its reserved slots of one day:
+# bit i is set when the table is reserved during the i-th slot after midnight.
+Bitmaps = Dict[int, int]
+
+
+class AvailabilityIndex:
+    """
+    In-memory index of which tables are free in which slots of a day.
+
+    A day's bitmaps are loaded with one query the first time the day is
+    needed and reloaded after the TTL; in between, the reservations service
+    marks and clears slots as reservations are created and deleted. Updates
+    made while a day is being loaded are replayed on the loaded bitmaps.
+    The index is not shared between worker processes: it only has to be
+    fresh enough to offer tables that are likely free, while the exclusion
+    constraint on `reservations` is what rules out double-booking.
+    """
+
+    def __init__(
+        self,
+        slot_minutes: int,
+        duration_minutes: int,
+        opening_hour: int,
+        closing_hour: int,
+        maxsize: int,
+        ttl: float,
+    ):
+        self.slot = timedelta(minutes=slot_minutes)
+        self.duration = timedelta(minutes=duration_minutes)
+        self.ttl = ttl
+
+        # The number of slots a reservation occupies, and the first and
+        # last slots it can start in.
+        self._length = -(-duration_minutes // slot_minutes)
+        self._first_start = -(-opening_hour * 60 // slot_minutes)
+        self._last_start = (closing_hour * 60 - duration_minutes) // slot_minutes
+
+        self._days = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._pending: Dict[date, List[list]] = {}
+        self._tables: List[Tuple[int, int]] = []
+        self._tables_expires_at = 0.0
+
+    @staticmethod
+    def _midnight(day: date) -> datetime:
+        return datetime.combine(day, datetime.min.time())
+
+    def _mask(self, day: date, start: datetime, end: datetime) -> int:
+        midnight = self._midnight(day)
+        first = max(start - midnight, timedelta(0)) // self.slot
+        last = -(-min(end - midnight, timedelta(days=1)) // self.slot)
+        return ((1 << (last - first)) - 1) << first if last > first else 0
+
+    @staticmethod
+    def _set(bitmaps: Bitmaps, table_id: int, mask: int, reserved: bool):
+        if reserved:
+            bitmaps[table_id] = bitmaps.get(table_id, 0) | mask
+        else:
+            bitmaps[table_id] = bitmaps.get(table_id, 0) & ~mask
+
+    def is_bookable(self, start: datetime) -> bool:
+        """
+        Check that a reservation can start at `start`: at the beginning of
+        a slot, within opening hours and ending by closing time.
+        """
+        offset = start - self._midnight(start.date())
+        return (
+            offset % self.slot == timedelta(0)
+            and self._first_start <= offset // self.slot <= self._last_start
+        )
+
+    async def _get_tables(self, db_session: AsyncSession) -> List[Tuple[int, int]]:
+        if self._tables_expires_at <= time.monotonic():
+            res = await db_session.exec(
+                select(DiningTable.id, DiningTable.seats).order_by(
+                    DiningTable.seats, DiningTable.id
+                )
+            )
+            self._tables = [tuple(row) for row in res.all()]
+            self._tables_expires_at = time.monotonic() + self.ttl
+        return self._tables
+
+    async def _load(self, day: date, db_session: AsyncSession) -> Bitmaps:
+        pending = []
+        self._pending.setdefault(day, []).append(pending)
+        try:
+            midnight = self._midnight(day)
+            # Served by the GiST index of the exclusion constraint.
+            res = await db_session.exec(
+                select(Reservation.table_id, Reservation.time, Reservation.end_time)
+                .where(Reservation.table_id.is_not(None))
+                .where(
+                    func.tsrange(Reservation.time, Reservation.end_time).op("&&")(
+                        func.tsrange(midnight, midnight + timedelta(days=1))
+                    )
+                )
+            )
+            bitmaps = {}
+            for table_id, start, end in res.all():
+                self._set(bitmaps, table_id, self._mask(day, start, end), True)
+            for update in pending:
+                self._set(bitmaps, *update)
+        finally:
+            loads = self._pending[day]
+            loads.remove(pending)
+            if not loads:
+                del self._pending[day]
+
+        self._days.set(day, bitmaps)
+        return bitmaps
+
+    async def _get_day(self, day: date, db_session: AsyncSession) -> Bitmaps:
+        bitmaps = self._days.get(day)
+        if bitmaps is None:
+            bitmaps = await self._load(day, db_session)
+        return bitmaps
+
+    def _update(self, reservation: Reservation, reserved: bool):
+        if reservation.table_id is None:
+            return
+        last_day = (reservation.end_time - timedelta(microseconds=1)).date()
+        for day in {reservation.time.date(), last_day}:
+            update = (
+                reservation.table_id,
+                self._mask(day, reservation.time, reservation.end_time),
+                reserved,
+            )
+            for pending in self._pending.get(day, ()):
+                pending.append(update)
+            bitmaps = self._days.get(day)
+            if bitmaps is not None:
+                self._set(bitmaps, *update)
+
+    def add(self, reservation: Reservation):
+        """
+        Mark the slots of a committed reservation as reserved.
+        """
+        self._update(reservation, True)
+
+    def remove(self, reservation: Reservation):
+        """
+        Mark the slots of a deleted reservation as free.
+        """
+        self._update(reservation, False)
+
+    def invalidate(self, day: date):
+        """
+        Drop a day's bitmaps, so they are reloaded on the next lookup.
+        """
+        self._days.pop(day)
+
+    def invalidate_tables(self):
+        """
+        Reload the tables on the next lookup.
+        """
+        self._tables_expires_at = 0.0
+
+    async def free_tables(
+        self, start: datetime, guests: int, db_session: AsyncSession
+    ) -> List[int]:
+        """
+        Find the tables with enough seats that are free for a reservation
+        starting at `start`.
+
+        Args:
+            start (datetime): The start of the reservation, a bookable slot.
+            guests (int): The number of guests.
+            db_session (AsyncSession): The session used to load missing data.
+
+        Returns:
+            List[int]: The IDs of the free tables, smallest first.
+        """
+        bitmaps = await self._get_day(start.date(), db_session)
+        slot = (start - self._midnight(start.date())) // self.slot
+        window = ((1 << self._length) - 1) << slot
+        return [
+            id
+            for id, seats in await self._get_tables(db_session)
+            if seats >= guests and not bitmaps.get(id, 0) & window
+        ]
+
+    async def get(
+        self, day: date, guests: int, after: datetime, db_session: AsyncSession
+    ) -> Availability:
+        """
+        List the slots of a day in which a reservation can start, with the
+        tables that are free for the whole reservation.
+
+        Args:
+            day (date): The day to look up.
+            guests (int): Only include tables with at least this many seats.
+            after (datetime): Only include slots starting after this time.
+            db_session (AsyncSession): The session used to load missing data.
+
+        Returns:
+            Availability: The slots with at least one free table.
+        """
+        tables = [t for t in await self._get_tables(db_session) if t[1] >= guests]
+        bitmaps = await self._get_day(day, db_session)
+
+        # Bit i of `free` is set when the table is free from slot i for the
+        # whole length of a reservation.
+        free = []
+        for id, seats in tables:
+            reserved = bitmaps.get(id, 0)
+            blocked = reserved
+            for i in range(1, self._length):
+                blocked |= reserved >> i
+            free.append((id, seats, ~blocked))
+
+        midnight = self._midnight(day)
+        slots = []
+        for slot in range(self._first_start, self._last_start + 1):
+            start = midnight + slot * self.slot
+            if start <= after:
+                continue
+            available = [(id, seats) for id, seats, f in free if f >> slot & 1]
+            if available:
+                slots.append(
+                    Slot(
+                        time=start,
+                        tables=[id for id, _ in available],
+                        max_guests=max(seats for _, seats in available),
+                    )
+                )
+
+        return Availability(date=day, slots=slots)
+
+
+availability = AvailabilityIndex(
+    slot_minutes=settings.RESERVATION_SLOT_MINUTES,
+    duration_minutes=settings.RESERVATION_DURATION_MINUTES,
+    opening_hour=settings.RESERVATION_OPENING_HOUR,
+    closing_hour=settings.RESERVATION_CLOSING_HOUR,
+    maxsize=settings.RESERVATION_AVAILABILITY_DAYS,
+    ttl=settings.RESERVATION_AVAILABILITY_TTL,
+)
@@ -1,8 +1,19 @@
 from sqlmodel import SQLModel, Field
 
+from typing import Optional
+
 from datetime import datetime
 
 
+class DiningTable(SQLModel, table=True):
+    __tablename__ = "dining_tables"
+
+    id: int = Field(primary_key=True)
+
+    name: str = Field(unique=True, nullable=False)
+    seats: int = Field(nullable=False)
+
+
 class Reservation(SQLModel, table=True):
     __tablename__ = "reservations"
 
@@ -11,3 +22,8 @@ class Reservation(SQLModel, table=True):
     user_id: int = Field(foreign_key="users.id", ondelete="CASCADE")
 
     time: datetime = Field(nullable=False)
+    end_time: datetime = Field(nullable=False)
+
+    # Reservations made before tables were introduced have no table.
+    table_id: Optional[int] = Field(default=None, foreign_key="dining_tables.id")
+    guests: int = Field(default=1, nullable=False)
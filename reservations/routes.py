@@ -1,19 +1,26 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 
-from typing import Annotated, Dict, List, Union
+from typing import Annotated, Dict, List, Optional, Union
 
-from database import get_db_session
+from datetime import date
 
-from auth import get_current_user, admin
+from database import get_db_session, get_db_read_session
+
+from auth import get_authorized_user, admin
 
 from http_exceptions import AccessDenied
 
 from users import User
 
+from pagination import Limit, Page, Timestamp
+
+from config import settings
+
 from . import service
-from .models import Reservation
+from .models import DiningTable, Reservation
+from .schemas import Availability, CreateTableSchema
 
 router = APIRouter(prefix="/reservations", tags=["Reservations"])
 
@@ -21,54 +28,101 @@ router = APIRouter(prefix="/reservations", tags=["Reservations"])
 @router.post("/", status_code=201, response_model=Dict[str, Union[str, Reservation]])
 async def create_reservation(
     time: str,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
+    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    guests: Annotated[int, Query(ge=1)] = 1,
+):
+    return await service.create(time, current_user.id, db_session, guests)
+
+
+@router.get("/availability", response_model=Availability)
+async def get_availability(
+    day: Annotated[date, Query(alias="date")],
+    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    guests: Annotated[int, Query(ge=1)] = 1,
+):
+    return await service.get_availability(day, db_session, guests)
+
+
+@router.post(
+    "/tables/", status_code=201, response_model=Dict[str, Union[str, DiningTable]]
+)
+async def create_table(
+    data: CreateTableSchema,
+    current_user: Annotated[User, Depends(admin)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
 ):
-    return await service.create(time, current_user.id, db_session)
+    return await service.create_table(data, db_session)
+
+
+@router.get("/tables/", response_model=List[DiningTable])
+async def get_tables(
+    db_session: Annotated[AsyncSession, Depends(get_db_read_session)],
+):
+    return await service.get_tables(db_session)
 
 
 @router.get("/{id}", response_model=Reservation)
 async def get_reservation_by_id(
     id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
 ):
     return await service.get(id, current_user, db_session)
 
 
-@router.get("/user/{user_id}", response_model=List[Reservation])
+@router.get("/user/{user_id}", response_model=Page[Reservation])
 async def get_reservations_by_user_id(
     user_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    limit: Limit = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    time_from: Optional[Timestamp] = None,
+    time_to: Optional[Timestamp] = None,
 ):
     if current_user.id != user_id:
         if current_user.role != "admin":
             raise AccessDenied()
 
-    return await service.get_by_user_id(user_id, db_session)
+    return await service.get_by_user_id(
+        user_id, db_session, limit, after, sort, time_from, time_to
+    )
 
 
-@router.get("/user/current/", response_model=List[Reservation])
+@router.get("/user/current/", response_model=Page[Reservation])
 async def get_current_user_reservations(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    limit: Limit = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    time_from: Optional[Timestamp] = None,
+    time_to: Optional[Timestamp] = None,
 ):
-    return await service.get_by_user_id(current_user.id, db_session)
+    return await service.get_by_user_id(
+        current_user.id, db_session, limit, after, sort, time_from, time_to
+    )
 
 
-@router.get("/all/", response_model=List[Reservation])
+@router.get("/all/", response_model=Page[Reservation])
 async def get_all_reservations(
     current_user: Annotated[User, Depends(admin)],
-    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    db_session: Annotated[AsyncSession, Depends(get_db_read_session)],
+    limit: Limit = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    time_from: Optional[Timestamp] = None,
+    time_to: Optional[Timestamp] = None,
 ):
-    return await service.get_all(db_session)
+    return await service.get_all(db_session, limit, after, sort, time_from, time_to)
 
 
 @router.delete("/", status_code=204)
 async def delete_reservation(
     id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
 ):
-    return await service.delete(id, db_session)
+    return await service.delete(id, current_user, db_session)
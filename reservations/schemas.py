@@ -0,0 +1,37 @@
+from pydantic import BaseModel, field_validator
+
+from fastapi import HTTPException
+
+from typing import List
+
+from datetime import date, datetime
+
+
+class CreateTableSchema(BaseModel):
+    name: str
+    seats: int
+
+    @field_validator("name")
+    def validate_name(cls, v: str) -> str:
+        if not v or len(v) > 50:
+            raise HTTPException(status_code=400, detail="Invalid table name")
+        return v
+
+    @field_validator("seats")
+    def validate_seats(cls, v: int) -> int:
+        if not 1 <= v <= 50:
+            raise HTTPException(
+                status_code=400, detail="A table must have between 1 and 50 seats"
+            )
+        return v
+
+
+class Slot(BaseModel):
+    time: datetime
+    tables: List[int]
+    max_guests: int
+
+
+class Availability(BaseModel):
+    date: date
+    slots: List[Slot]
@@ -1,31 +1,51 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 
+from sqlalchemy.exc import IntegrityError
+
 from fastapi import HTTPException
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-from typing import Optional
+from typing import List, Optional
 
 from users import User
 
 from http_exceptions import ObjectWithIdNotFound, AccessDenied
 
-from .models import Reservation
+from pagination import Page, paginate
+
+from config import settings
+
+from .availability import availability
+from .models import DiningTable, Reservation
+from .schemas import Availability, CreateTableSchema
 
+# How many free tables to try when other workers book them first.
+BOOKING_ATTEMPTS = 3
 
-async def create(time: str, user_id: int, db_session: AsyncSession):
+MIN_NOTICE = timedelta(hours=24)
+
+
+async def create(time: str, user_id: int, db_session: AsyncSession, guests: int = 1):
     """
     Create a new reservation for a user at a specified time.
 
+    The smallest table with enough seats that the availability index shows
+    as free is booked. If another worker books it first, the exclusion
+    constraint rejects the reservation and the next free table is tried.
+
     Args:
         time (str): The reservation time in ISO 8601 format.
         user_id (int): The ID of the user making the reservation.
         db_session (AsyncSession): The asynchronous database session.
+        guests (int): The number of guests.
 
     Raises:
         HTTPException:
             - 400 if the reservation time is less than 24 hours from now.
+            - 400 if the reservation doesn't start at a slot within opening hours.
+            - 409 if no table with enough seats is free at that time.
 
     Returns:
         dict: A dictionary containing a success message and the created reservation instance.
@@ -33,18 +53,110 @@ async def create(time: str, user_id: int, db_session: AsyncSession):
     time = datetime.fromisoformat(time)
     now = datetime.now()
 
-    if time <= now + timedelta(hours=24):
+    if time <= now + MIN_NOTICE:
         raise HTTPException(
             status_code=400, detail="Less than 24 hours left until the reservation time"
         )
+    if not availability.is_bookable(time):
+        raise HTTPException(
+            status_code=400,
+            detail="Reservations must start at a time slot within opening hours",
+        )
+
+    tried = set()
+    for _ in range(BOOKING_ATTEMPTS):
+        free = await availability.free_tables(time, guests, db_session)
+        free = [id for id in free if id not in tried]
+        if not free:
+            break
+
+        reservation = Reservation(
+            user_id=user_id,
+            time=time,
+            end_time=time + availability.duration,
+            table_id=free[0],
+            guests=guests,
+        )
+        db_session.add(reservation)
+        try:
+            await db_session.commit()
+        except IntegrityError:
+            await db_session.rollback()
+            tried.add(free[0])
+            availability.invalidate(time.date())
+            continue
+        await db_session.refresh(reservation)
+
+        availability.add(reservation)
+
+        return {"message": "Reservation created", "reservation": reservation}
+
+    raise HTTPException(
+        status_code=409,
+        detail=f"No table with {guests} or more seats is free at this time",
+    )
 
-    reservation = Reservation(user_id=user_id, time=time)
 
-    db_session.add(reservation)
-    await db_session.commit()
-    await db_session.refresh(reservation)
+async def get_availability(
+    day: date, db_session: AsyncSession, guests: int = 1
+) -> Availability:
+    """
+    Retrieve the time slots of a day that can still be booked.
+
+    Args:
+        day (date): The day to look up.
+        db_session (AsyncSession): The asynchronous database session.
+        guests (int): The number of guests the tables must seat.
+
+    Returns:
+        Availability: The bookable slots with their free tables.
+    """
+    return await availability.get(day, guests, datetime.now() + MIN_NOTICE, db_session)
+
+
+async def create_table(data: CreateTableSchema, db_session: AsyncSession):
+    """
+    Add a table that reservations can be made for.
+
+    Args:
+        data (CreateTableSchema): The name and number of seats of the table.
+        db_session (AsyncSession): The asynchronous database session.
+
+    Raises:
+        HTTPException:
+            - 409 if a table with the same name already exists.
+
+    Returns:
+        dict: A dictionary containing a success message and the created table instance.
+    """
+    table = DiningTable(**data.model_dump())
+
+    try:
+        db_session.add(table)
+        await db_session.commit()
+        await db_session.refresh(table)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=409, detail="Table with this name already exists"
+        )
+
+    availability.invalidate_tables()
+
+    return {"message": "Table created", "table": table}
 
-    return {"message": "Reservation created", "reservation": reservation}
+
+async def get_tables(db_session: AsyncSession) -> List[DiningTable]:
+    """
+    Retrieve all tables.
+
+    Args:
+        db_session (AsyncSession): The asynchronous database session.
+
+    Returns:
+        List[DiningTable]: The tables, in ID order.
+    """
+    res = await db_session.exec(select(DiningTable).order_by(DiningTable.id))
+    return res.all()
 
 
 async def get(id: int, current_user: User, db_session: AsyncSession):
@@ -75,39 +187,70 @@ async def get(id: int, current_user: User, db_session: AsyncSession):
     return reservation
 
 
-async def get_by_user_id(user_id: int, db_session: AsyncSession):
+async def get_by_user_id(
+    user_id: int,
+    db_session: AsyncSession,
+    limit: int = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None,
+) -> Page[Reservation]:
     """
-    Retrieve all reservations for a specific user.
+    Retrieve a page of reservations for a specific user.
 
     Args:
         user_id (int): The ID of the user whose reservations to retrieve.
         db_session (AsyncSession): The asynchronous database session.
+        limit (int): The maximum number of reservations to return.
+        after (Optional[str]): The cursor of the previous page.
+        sort (str): The field to sort by ("id" or "time"), "-" prefix for descending.
+        time_from (Optional[datetime]): Only return reservations at or after this time.
+        time_to (Optional[datetime]): Only return reservations before this time.
 
     Returns:
-        List[Reservation]: A list of reservations belonging to the specified user.
+        Page[Reservation]: A page of reservations belonging to the specified user.
     """
-    res = await db_session.exec(
-        select(Reservation).where(Reservation.user_id == user_id)
+    return await get_all(
+        db_session, limit, after, sort, time_from, time_to, user_id=user_id
     )
-    reservations = res.all()
-
-    return reservations
 
 
-async def get_all(db_session: AsyncSession):
+async def get_all(
+    db_session: AsyncSession,
+    limit: int = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+) -> Page[Reservation]:
     """
-    Retrieve all reservations in the system.
+    Retrieve a page of reservations in the system.
 
     Args:
         db_session (AsyncSession): The asynchronous database session.
+        limit (int): The maximum number of reservations to return.
+        after (Optional[str]): The cursor of the previous page.
+        sort (str): The field to sort by ("id" or "time"), "-" prefix for descending.
+        time_from (Optional[datetime]): Only return reservations at or after this time.
+        time_to (Optional[datetime]): Only return reservations before this time.
+        user_id (Optional[int]): Only return reservations of this user.
 
     Returns:
-        List[Reservation]: A list of all reservation instances.
+        Page[Reservation]: A page of reservation instances.
     """
-    res = await db_session.exec(select(Reservation))
-    reservations = res.all()
-
-    return reservations
+    query = select(Reservation)
+    if user_id is not None:
+        query = query.where(Reservation.user_id == user_id)
+    if time_from is not None:
+        query = query.where(Reservation.time >= time_from)
+    if time_to is not None:
+        query = query.where(Reservation.time < time_to)
+
+    return await paginate(
+        db_session, query, Reservation, limit, after, sort, ("id", "time")
+    )
 
 
 async def delete(id: int, current_user: User, db_session: AsyncSession):
@@ -127,6 +270,9 @@ async def delete(id: int, current_user: User, db_session: AsyncSession):
         None
     """
     reservation = await get(id, current_user, db_session)
+    deleted = Reservation.model_validate(reservation)
 
     await db_session.delete(reservation)
     await db_session.commit()
+
+    availability.remove(deleted)
@@ -0,0 +1,109 @@
+import pytest
+
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import app  # noqa: F401
+
+from carts.models import CartItem
+from carts.store import MemoryCartStore
+
+
+def mock_db_session(*items: CartItem) -> AsyncMock:
+    db_session = AsyncMock(spec=AsyncSession)
+    db_session.exec.return_value = MagicMock(all=MagicMock(return_value=list(items)))
+    return db_session
+
+
+@pytest.mark.asyncio
+async def test_get_loads_cart_once():
+    store = MemoryCartStore(maxsize=10, batch_size=10)
+    db_session = mock_db_session(
+        CartItem(user_id=1, product_id=2, quantity=3, unit_price=4.0)
+    )
+
+    cart = await store.get(1, db_session)
+    await store.get(1, db_session)
+
+    assert list(cart.products) == ["2"]
+    assert db_session.exec.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used_clean_cart():
+    store = MemoryCartStore(maxsize=2, batch_size=10)
+    db_session = mock_db_session()
+
+    await store.get(1, db_session)
+    await store.get(2, db_session)
+    await store.get(1, db_session)
+    await store.get(3, db_session)
+
+    assert list(store._carts) == [1, 3]
+
+
+@pytest.mark.asyncio
+async def test_keeps_loaded_cart_when_older_carts_are_dirty():
+    store = MemoryCartStore(maxsize=1, batch_size=10)
+    db_session = mock_db_session()
+
+    await store.get(1, db_session)
+    store._changed(1)
+    cart = await store.get(2, db_session)
+
+    assert cart.user_id == 2
+    assert list(store._carts) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_released_take_keeps_cart():
+    store = MemoryCartStore(maxsize=10, batch_size=10)
+    db_session = mock_db_session(
+        CartItem(user_id=1, product_id=2, quantity=3, unit_price=4.0)
+    )
+
+    taken = await store.take(1, db_session)
+    store.release_take(1, db_session)
+
+    assert taken.products == (await store.get(1, db_session)).products
+    assert (await store.take(1, db_session)).products != {}
+
+
+@pytest.mark.asyncio
+async def test_cart_is_taken_once_until_transaction_ends():
+    store = MemoryCartStore(maxsize=10, batch_size=10)
+    db_session = mock_db_session(
+        CartItem(user_id=1, product_id=2, quantity=3, unit_price=4.0)
+    )
+    other_session = mock_db_session()
+
+    await store.take(1, db_session)
+    assert (await store.take(1, other_session)).products == {}
+
+    store.release_take(1, other_session)
+    store.commit_take(1, db_session)
+
+    assert (await store.get(1, db_session)).products == {}
+    assert 1 in store._dirty
+
+
+@pytest.mark.asyncio
+async def test_committed_take_keeps_products_added_meanwhile():
+    store = MemoryCartStore(maxsize=10, batch_size=10)
+    db_session = mock_db_session(
+        CartItem(user_id=1, product_id=2, quantity=3, unit_price=4.0),
+        CartItem(user_id=1, product_id=5, quantity=1, unit_price=6.0),
+    )
+
+    await store.take(1, db_session)
+    items = store._carts[1]
+    items[2].quantity = 4
+    items[7] = CartItem(user_id=1, product_id=7, quantity=1, unit_price=8.0)
+    store.commit_take(1, db_session)
+
+    cart = await store.get(1, db_session)
+    assert cart.products == {
+        "2": {"quantity": 1, "price": 4.0},
+        "7": {"quantity": 1, "price": 8.0},
+    }
@@ -0,0 +1,54 @@
+from fastapi import FastAPI, Depends
+from fastapi.testclient import TestClient
+
+from typing import Annotated
+
+from conditional import Conditional, conditional_get, validators
+
+app = FastAPI()
+calls = []
+
+
+@app.get("/items/")
+async def get_items(
+    conditional: Annotated[
+        Conditional, Depends(conditional_get("items", cache_control="no-cache"))
+    ],
+):
+    calls.append(1)
+    return conditional.tag({"items": [1, 2, 3]})
+
+
+client = TestClient(app)
+
+
+def test_not_modified_without_running_the_route():
+    etag = client.get("/items/").headers["etag"]
+    calls.clear()
+
+    response = client.get("/items/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert calls == []
+
+
+def test_etag_is_derived_from_the_body():
+    etag = client.get("/items/").headers["etag"]
+    validators.invalidate("items")
+
+    assert client.get("/items/").headers["etag"] == etag
+
+
+def test_invalidation_drops_stored_validators():
+    etag = client.get("/items/").headers["etag"]
+    validators.invalidate("items")
+    calls.clear()
+
+    response = client.get("/items/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert calls == [1]
+    assert (
+        client.get("/items/", headers={"If-None-Match": '"other"'}).status_code == 200
+    )
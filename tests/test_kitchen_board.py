@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from app import app  # noqa: F401
+
+from orders.board import KitchenBoard
+from orders.schemas import BoardOrder
+
+start = datetime(2026, 1, 1, 12)
+
+
+def board_order(id: int, minutes: int, products: dict) -> BoardOrder:
+    return BoardOrder(
+        id=id,
+        user_id=1,
+        created_at=start + timedelta(minutes=minutes),
+        products=products,
+    )
+
+
+def test_orders_are_kept_oldest_first():
+    board = KitchenBoard()
+    board._add(board_order(3, 2, {1: 1}))
+    board._add(board_order(1, 0, {1: 2}))
+    board._add(board_order(4, 2, {2: 1}))
+    board._add(board_order(2, 1, {2: 3}))
+
+    snapshot = board.snapshot(limit=3)
+
+    assert [order.id for order in snapshot.orders] == [1, 2, 3]
+    assert snapshot.orders_count == 4
+    assert [(p.product_id, p.quantity) for p in snapshot.products] == [(1, 3), (2, 4)]
+
+
+def test_remove_and_add_again():
+    board = KitchenBoard()
+    for id in range(1, 4):
+        board._add(board_order(id, id, {id: 1}))
+
+    board._remove(2)
+    board._remove(5)
+    assert [order.id for order in board.snapshot(limit=10).orders] == [1, 3]
+
+    board._add(board_order(2, 2, {2: 1}))
+    board._add(board_order(2, 2, {2: 1}))
+    snapshot = board.snapshot(limit=10)
+    assert [order.id for order in snapshot.orders] == [1, 2, 3]
+    assert [p.quantity for p in snapshot.products] == [1, 1, 1]
@@ -0,0 +1,45 @@
+import pytest
+
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import app  # noqa: F401
+
+from carts import Cart
+from orders import service as orders_service
+
+
+@pytest.fixture
+def db_session(monkeypatch):
+    session = AsyncMock(spec=AsyncSession)
+    session.execute.return_value = MagicMock(all=MagicMock(return_value=[]))
+    session_maker = MagicMock()
+    session_maker.return_value.__aenter__.return_value = session
+    monkeypatch.setattr(orders_service, "session_maker", session_maker)
+    monkeypatch.setattr(
+        orders_service.carts_service,
+        "take_many",
+        AsyncMock(
+            side_effect=lambda user_ids, _: {u: Cart(user_id=u) for u in user_ids}
+        ),
+    )
+    return session
+
+
+@pytest.mark.asyncio
+async def test_claims_idempotency_keys_in_order(db_session):
+    await orders_service.create_many([(2, "b"), (1, "z"), (2, "a"), (1, None)])
+
+    stmt = db_session.execute.await_args_list[0].args[0]
+    params = stmt.compile().params
+    rows = [(params[f"user_id_m{i}"], params[f"key_m{i}"]) for i in range(3)]
+    assert rows == [(1, "z"), (2, "a"), (2, "b")]
+
+
+@pytest.mark.asyncio
+async def test_empty_carts_fail_only_their_requests(db_session):
+    results = await orders_service.create_many([(1, None), (2, None)])
+
+    assert [r.status_code for r in results] == [400, 400]
+    db_session.commit.assert_awaited_once()
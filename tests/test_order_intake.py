@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from fastapi import HTTPException
+
+from app import app  # noqa: F401
+
+from orders.intake import OrderIntake
+
+
+def make_intake(handler, batch_size=10, max_wait=0.01, queue_size=10):
+    return OrderIntake(
+        handler, batch_size=batch_size, max_wait=max_wait, queue_size=queue_size
+    )
+
+
+async def run_intake(intake: OrderIntake, *requests):
+    worker = asyncio.create_task(intake.run())
+    try:
+        return await asyncio.gather(
+            *(intake.submit(*request) for request in requests),
+            return_exceptions=True,
+        )
+    finally:
+        worker.cancel()
+
+
+@pytest.mark.asyncio
+async def test_batches_requests():
+    batches = []
+
+    async def handler(requests):
+        batches.append(requests)
+        return [f"order of {user_id}" for user_id, _ in requests]
+
+    intake = make_intake(handler)
+    results = await run_intake(intake, (1, None), (2, "key"), (3, None))
+
+    assert results == ["order of 1", "order of 2", "order of 3"]
+    assert batches == [[(1, None), (2, "key"), (3, None)]]
+    assert intake.stats()["batches"] == 1
+
+
+@pytest.mark.asyncio
+async def test_returned_exceptions_are_raised_to_their_callers():
+    async def handler(requests):
+        return [
+            HTTPException(status_code=400) if user_id == 2 else user_id
+            for user_id, _ in requests
+        ]
+
+    results = await run_intake(make_intake(handler), (1, None), (2, None))
+
+    assert results[0] == 1
+    assert isinstance(results[1], HTTPException)
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_one_request_at_a_time():
+    batches = []
+
+    async def handler(requests):
+        batches.append(requests)
+        if (2, None) in requests:
+            raise RuntimeError("bad request")
+        return [user_id for user_id, _ in requests]
+
+    intake = make_intake(handler)
+    results = await run_intake(intake, (1, None), (2, None), (3, None))
+
+    assert results[0] == 1
+    assert isinstance(results[1], RuntimeError)
+    assert results[2] == 3
+    assert batches[1:] == [[(1, None)], [(2, None)], [(3, None)]]
+    assert intake.stats()["failed_batches"] == 1
+    assert intake.stats()["failed_orders"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rejects_requests_when_queue_is_full():
+    intake = make_intake(None, queue_size=1)
+    intake.queue.put_nowait((1, None, asyncio.get_running_loop().create_future()))
+
+    with pytest.raises(HTTPException) as exc_info:
+        await intake.submit(2)
+
+    assert exc_info.value.status_code == 503
+    assert intake.stats()["rejected"] == 1
@@ -0,0 +1,45 @@
+from app import app  # noqa: F401
+
+from fastapi import HTTPException
+
+from datetime import datetime
+
+import pytest
+
+from orders.models import Order
+from pagination import decode_cursor, encode_cursor
+from products.models import Product
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 1, 1, 12, 30)
+
+    assert decode_cursor(encode_cursor(created_at, 7), Order.created_at) == (
+        created_at,
+        7,
+    )
+    assert decode_cursor(encode_cursor("Tea", 3), Product.title) == ("Tea", 3)
+    assert decode_cursor(encode_cursor(2, 3), Product.price) == (2.0, 3)
+
+
+def test_aware_cursor_datetime_is_converted_to_naive_utc():
+    cursor = encode_cursor("2025-01-01T14:30:00+02:00", 7)
+
+    assert decode_cursor(cursor, Order.created_at) == (datetime(2025, 1, 1, 12, 30), 7)
+
+
+@pytest.mark.parametrize(
+    "value, id, column",
+    [
+        ("abc", 1, Product.price),
+        (5, 1, Order.created_at),
+        (1, 1, Product.title),
+        (None, "1", Order.id),
+        (1.5, True, Product.price),
+    ],
+)
+def test_mistyped_cursor_is_rejected(value, id, column):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(encode_cursor(value, id), column)
+
+    assert exc.value.status_code == 400
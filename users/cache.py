@@ -0,0 +1,8 @@
+from cache import TTLCache
+
+from config import settings
+
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
+token_version_cache = TTLCache(
+    maxsize=settings.USER_CACHE_SIZE, ttl=settings.ACCESS_TOKEN_VERSION_CACHE_TTL
+)
@@ -20,3 +20,8 @@ class User(SQLModel, table=True):
     name: str | None = Field()
 
     hashed_password: str = Field(nullable=False)
+    token_version: int = Field(
+        sa_column=sa.Column(
+            "token_version", sa.Integer(), nullable=False, default=0, server_default="0"
+        )
+    )
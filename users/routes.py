@@ -3,15 +3,20 @@ from fastapi import APIRouter, Depends, Response
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from typing import Annotated, Dict, List, Union
+from typing import Annotated, Dict, Optional, Union
 
-from database import get_db_session
+from database import get_db_session, get_db_read_session
 
-from auth import get_current_user, admin
+from auth import get_current_user, get_authorized_user, admin
 
 from http_exceptions import AccessDenied
 
-from .models import User
+from pagination import Limit, Page
+
+from config import settings
+
+from .models import Role, User
+from .cache import user_cache
 from .schemas import CreateUserSchema, UpdateUserSchema, CreateAdminSchema
 
 from . import service
@@ -38,7 +43,7 @@ async def create_admin_user(
 @router.get("/{id}", response_model=User)
 async def get_user_by_id(
     id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
 ):
     if current_user.role != "admin":
@@ -68,19 +73,30 @@ async def get_current_user(
     return current_user
 
 
-@router.get("/all/", response_model=List[User])
+@router.get("/all/", response_model=Page[User])
 async def get_all_users(
     current_user: Annotated[User, Depends(admin)],
-    db_session: Annotated[AsyncSession, Depends(get_db_session)],
+    db_session: Annotated[AsyncSession, Depends(get_db_read_session)],
+    limit: Limit = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    role: Optional[Role] = None,
+):
+    return await service.get_all(db_session, limit, after, sort, role)
+
+
+@router.get("/cache/", response_model=Dict[str, Union[int, float]])
+async def get_user_cache_stats(
+    current_user: Annotated[User, Depends(admin)],
 ):
-    return await service.get_all(db_session)
+    return user_cache.stats()
 
 
 @router.patch("/{id}", response_model=Dict[str, Union[str, User]])
 async def update_user(
     id: int,
     data: UpdateUserSchema,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
 ):
     if current_user.role != "admin":
@@ -93,7 +109,7 @@ async def update_user(
 @router.delete("/{id}", status_code=204)
 async def delete_user(
     id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_authorized_user)],
     db_session: Annotated[AsyncSession, Depends(get_db_session)],
 ):
     if current_user.role != "admin":
@@ -5,17 +5,20 @@ from sqlalchemy.exc import IntegrityError
 
 from fastapi import HTTPException
 
-from typing import Union
+from typing import Optional, Union
 
 import re
 
-from auth.utils import hash_password
+from auth.utils import hash_password_async
 
 from http_exceptions import ObjectWithIdNotFound
 
 from config import settings
 
-from .models import User
+from pagination import Page, paginate
+
+from .cache import token_version_cache, user_cache
+from .models import Role, User
 from .schemas import CreateUserSchema, CreateAdminSchema, UpdateUserSchema
 
 
@@ -34,12 +37,13 @@ async def create(
         HTTPException:
             - 403 if admin secret is invalid.
             - 409 if a user with the same phone number already exists.
+            - 503 if too many passwords are being hashed at once.
 
     Returns:
         dict: A dictionary containing a success message and the created user instance.
     """
     user = User(**data.model_dump())
-    user.hashed_password = hash_password(data.password)
+    user.hashed_password = await hash_password_async(data.password)
 
     try:
         if data.secret != settings.ADMIN_SECRET:
@@ -85,6 +89,27 @@ async def get(
     return user
 
 
+async def get_token_version(id: int, db_session: AsyncSession) -> Optional[int]:
+    """
+    Retrieve the token version of a user, served from the token version cache
+    when possible.
+
+    Args:
+        id (int): The ID of the user.
+        db_session (AsyncSession): The asynchronous database session.
+
+    Returns:
+        Optional[int]: The user's token version, or None if the user doesn't exist.
+    """
+    version = token_version_cache.get(id)
+    if version is None:
+        res = await db_session.exec(select(User.token_version).where(User.id == id))
+        version = res.first()
+        if version is not None:
+            token_version_cache.set(id, version)
+    return version
+
+
 async def get_with_phone_number(phone_number: str, db_session: AsyncSession):
     """
     Retrieve a user by their phone number.
@@ -113,20 +138,31 @@ async def get_with_phone_number(phone_number: str, db_session: AsyncSession):
     return user
 
 
-async def get_all(db_session: AsyncSession):
+async def get_all(
+    db_session: AsyncSession,
+    limit: int = settings.PAGINATION_DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    sort: str = "id",
+    role: Optional[Role] = None,
+) -> Page[User]:
     """
-    Retrieve all users from the database.
+    Retrieve a page of users from the database.
 
     Args:
         db_session (AsyncSession): The asynchronous database session.
+        limit (int): The maximum number of users to return.
+        after (Optional[str]): The cursor of the previous page.
+        sort (str): The field to sort by ("id"), "-" prefix for descending.
+        role (Optional[Role]): Only return users with this role.
 
     Returns:
-        List[User]: A list of all user instances.
+        Page[User]: A page of user instances.
     """
-    res = await db_session.exec(select(User))
-    users = res.all()
+    query = select(User)
+    if role is not None:
+        query = query.where(User.role == role)
 
-    return users
+    return await paginate(db_session, query, User, limit, after, sort)
 
 
 async def update(
@@ -140,12 +176,14 @@ async def update(
     Args:
         id (int): The ID of the user to update.
         data (UpdateUserSchema): The data to update the user with. Password will be hashed if provided.
+            Changing the password or role revokes the user's existing access tokens.
         db_session (AsyncSession): The asynchronous database session.
 
     Returns:
         dict: A dictionary containing a success message and the updated user instance.
     """
     user = await get(id, db_session)
+    role = user.role
 
     print(data.model_dump().items())
     for k, v in data.model_dump().items():
@@ -153,12 +191,17 @@ async def update(
             if k != "password":
                 setattr(user, k, v)
     if data.password:
-        user.hashed_password = hash_password(data.password)
+        user.hashed_password = await hash_password_async(data.password)
+    if data.password or user.role != role:
+        user.token_version += 1
 
     db_session.add(user)
     await db_session.commit()
     await db_session.refresh(user)
 
+    user_cache.pop(id)
+    token_version_cache.pop(id)
+
     return {"message": "User updated", "user": user}
 
 
@@ -183,3 +226,6 @@ async def delete(
 
     await db_session.delete(user)
     await db_session.commit()
+
+    user_cache.pop(id)
+    token_version_cache.pop(id)